@@ -0,0 +1,522 @@
+"""
+Benchmarks voor het inlezen, omzetten, interpreteren en plotten van sonderingen en boringen
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+matplotlib.use("Agg")
+
+from gefxmlreader import BRO_CPT_COLUMNS, BRO_VOID, XmlBorehole, XmlCpt
+
+CPT_ROWS = [1000, 10000, 100000]
+BHR_LAYERS = [10, 50, 200]
+# de map results staat in .gitignore
+RESULTS_FILE = "results/benchmark.json"
+
+BRO_NAMESPACES = (
+    'xmlns:brocom="http://www.broservices.nl/xsd/brocommon/3.0" '
+    'xmlns:gml="http://www.opengis.net/gml/3.2"'
+)
+SOIL_NAMES = [
+    "zand",
+    "klei",
+    "veen",
+    "siltigZand",
+    "humeuzeKlei",
+    "zwakZandigeKlei",
+    "sterkGrindigZand",
+    "kleiigVeen",
+]
+SOIL_CODES = ["Zs1", "Kz2", "V", "Zk", "Ks3h2", "Zg2", "NBE", "Lz1", "Kh3s1g1", "Z"]
+
+
+def synthetic_cpt_data(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Create random but realistic looking cpt data
+
+    Arguments:
+        rows (int): number of samples
+        seed (int): seed for the random generator
+
+    Returns:
+        pd.DataFrame: data with the BRO column names, about 1% of the values is nan
+    """
+    rng = np.random.default_rng(seed)
+    depth = np.arange(rows) * 0.02
+    qc = np.abs(rng.normal(5, 3, rows)) + 0.05
+    fs = np.abs(rng.normal(0.05, 0.03, rows))
+    data = pd.DataFrame(
+        {
+            "penetrationLength": depth + 0.01,
+            "depth": depth,
+            "coneResistance": qc,
+            "localFriction": fs,
+            "frictionRatio": 100 * fs / qc,
+            "porePressureU2": rng.normal(0.1, 0.05, rows),
+            "inclinationResultant": np.abs(rng.normal(1, 0.5, rows)),
+        }
+    )
+    # een deel van de waarden ontbreekt, zoals in echte sonderingen
+    for column in data.columns:
+        data.loc[rng.random(rows) < 0.01, column] = np.nan
+    return data
+
+
+def synthetic_cpt(rows: int, seed: int = 0) -> XmlCpt:
+    """Create a CPT with random data and metadata
+
+    Arguments:
+        rows (int): number of samples
+        seed (int): seed for the random generator
+
+    Returns:
+        XmlCpt: cpt with data, metadata and some void values
+    """
+    cpt = XmlCpt()
+    cpt.data = synthetic_cpt_data(rows, seed)
+    cpt.testid = f"CPT{rows:08d}"
+    cpt.easting = 121000.0
+    cpt.northing = 487000.0
+    cpt.groundlevel = 0.5
+    cpt.date = datetime(2022, 1, 1)
+    return cpt
+
+
+def cpt_xml(rows: int, seed: int = 0) -> str:
+    """Create a BRO CPT XML document
+
+    Arguments:
+        rows (int): number of samples
+        seed (int): seed for the random generator
+
+    Returns:
+        str: xml document
+    """
+    data = synthetic_cpt_data(rows, seed)
+    values = np.full((rows, len(BRO_CPT_COLUMNS)), float(BRO_VOID))
+    for column in data.columns:
+        values[:, BRO_CPT_COLUMNS.index(column)] = data[column].fillna(BRO_VOID)
+    values = "".join(
+        ",".join(f"{v:.4f}" if v != BRO_VOID else str(BRO_VOID) for v in row) + ";"
+        for row in values
+    )
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<dispatchDocument xmlns="http://www.broservices.nl/xsd/dscpt/1.1" {BRO_NAMESPACES}
+    xmlns:cptcommon="http://www.broservices.nl/xsd/cptcommon/1.1">
+  <CPT_O>
+    <brocom:broId>CPT{seed:012d}</brocom:broId>
+    <deliveredLocation>
+      <cptcommon:location srsName="urn:ogc:def:crs:EPSG::28992">
+        <gml:pos>121000.123 487000.456</gml:pos>
+      </cptcommon:location>
+    </deliveredLocation>
+    <deliveredVerticalPosition>
+      <cptcommon:offset uom="m">0.52</cptcommon:offset>
+      <cptcommon:verticalDatum>NAP</cptcommon:verticalDatum>
+    </deliveredVerticalPosition>
+    <researchReportDate>
+      <brocom:date>2019-05-06</brocom:date>
+    </researchReportDate>
+    <conePenetrometerSurvey>
+      <cptcommon:finalDepth uom="m">{(rows - 1) * 0.02:.2f}</cptcommon:finalDepth>
+      <cptcommon:conePenetrationTest>
+        <cptcommon:cptResult>
+          <cptcommon:values>{values}</cptcommon:values>
+        </cptcommon:cptResult>
+      </cptcommon:conePenetrationTest>
+    </conePenetrometerSurvey>
+  </CPT_O>
+</dispatchDocument>
+"""
+
+
+def cpt_gef(rows: int, seed: int = 0) -> str:
+    """Create a GEF-CPT file
+
+    Arguments:
+        rows (int): number of samples
+        seed (int): seed for the random generator
+
+    Returns:
+        str: gef file contents
+    """
+    data = synthetic_cpt_data(rows, seed)
+    columns = [
+        "penetrationLength",
+        "coneResistance",
+        "localFriction",
+        "frictionRatio",
+        "porePressureU2",
+        "depth",
+    ]
+    values = data[columns].fillna(-9999).to_numpy()
+    lines = "".join(
+        ";".join(f"{v:.4f}" for v in row) + ";\n" for row in values.tolist()
+    )
+    return f"""#GEFID= 1, 1, 0
+#COLUMN= 6
+#COLUMNINFO= 1, m, sondeertrajectlengte, 1
+#COLUMNINFO= 2, MPa, conusweerstand, 2
+#COLUMNINFO= 3, MPa, plaatselijke wrijving, 3
+#COLUMNINFO= 4, %, wrijvingsgetal, 4
+#COLUMNINFO= 5, MPa, waterspanning u2, 6
+#COLUMNINFO= 6, m, gecorrigeerde diepte, 11
+#COLUMNSEPARATOR= ;
+#COLUMNVOID= 1, -9999
+#COLUMNVOID= 2, -9999
+#COLUMNVOID= 3, -9999
+#COLUMNVOID= 4, -9999
+#COLUMNVOID= 5, -9999
+#COLUMNVOID= 6, -9999
+#COMPANYID= Sondeerbedrijf B.V., 12345678, 31
+#FILEDATE= 2021, 03, 04
+#LASTSCAN= {rows}
+#PROJECTID= 4567
+#PROJECTNAME= Benchmark
+#STARTDATE= 2021, 03, 02
+#TESTID= S{seed:04d}
+#XYID= 28992, 121000.10, 487000.20, 0.01, 0.01
+#ZID= 31000, -0.55, 0.01
+#EOH=
+{lines}"""
+
+
+def synthetic_layers(layers: int, seed: int = 0) -> np.ndarray:
+    """Create layer boundaries for a borehole of 30 m
+
+    Arguments:
+        layers (int): number of layers
+        seed (int): seed for the random generator
+
+    Returns:
+        np.ndarray: boundaries below surface level, one more than the number of layers
+    """
+    rng = np.random.default_rng(seed)
+    thickness = rng.uniform(0.5, 1.5, layers)
+    return np.round(
+        np.concatenate([[0], np.cumsum(thickness)]) * 30 / thickness.sum(), 2
+    )
+
+
+def bhr_xml(layers: int, seed: int = 0) -> str:
+    """Create a BRO BHR-GT XML document
+
+    Arguments:
+        layers (int): number of layers
+        seed (int): seed for the random generator
+
+    Returns:
+        str: xml document
+    """
+    rng = np.random.default_rng(seed)
+    boundaries = synthetic_layers(layers, seed)
+    soillayers = "".join(
+        f"""
+        <bhrgtcom:layer>
+          <bhrgtcom:upperBoundary uom="m">{upper:.2f}</bhrgtcom:upperBoundary>
+          <bhrgtcom:lowerBoundary uom="m">{lower:.2f}</bhrgtcom:lowerBoundary>
+          <bhrgtcom:soil>
+            <bhrgtcom:geotechnicalSoilName>{soilname}</bhrgtcom:geotechnicalSoilName>
+            <bhrgtcom:colour>grijs</bhrgtcom:colour>
+            <bhrgtcom:sandMedianClass>fijn</bhrgtcom:sandMedianClass>
+          </bhrgtcom:soil>
+        </bhrgtcom:layer>"""
+        for upper, lower, soilname in zip(
+            boundaries[:-1],
+            boundaries[1:],
+            rng.choice(SOIL_NAMES, layers),
+        )
+    )
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<dispatchDocument xmlns="http://www.broservices.nl/xsd/dsbhr-gt/2.1" {BRO_NAMESPACES}
+    xmlns:bhrgtcom="http://www.broservices.nl/xsd/bhrgtcommon/2.1">
+  <BHR_GT_O>
+    <brocom:broId>BHR{seed:012d}</brocom:broId>
+    <deliveredLocation>
+      <bhrgtcom:location srsName="urn:ogc:def:crs:EPSG::28992">
+        <gml:pos>121500.5 487500.25</gml:pos>
+      </bhrgtcom:location>
+    </deliveredLocation>
+    <deliveredVerticalPosition>
+      <bhrgtcom:offset uom="m">1.25</bhrgtcom:offset>
+    </deliveredVerticalPosition>
+    <descriptionReportDate>
+      <brocom:date>2020-02-03</brocom:date>
+    </descriptionReportDate>
+    <boring>
+      <bhrgtcom:finalDepthBoring uom="m">{boundaries[-1]:.2f}</bhrgtcom:finalDepthBoring>
+    </boring>
+    <boreholeSampleDescription>
+      <bhrgtcom:descriptiveBoreholeLog>
+        <bhrgtcom:descriptionQuality>goed</bhrgtcom:descriptionQuality>
+        <bhrgtcom:descriptionLocation>veld</bhrgtcom:descriptionLocation>{soillayers}
+      </bhrgtcom:descriptiveBoreholeLog>
+    </boreholeSampleDescription>
+  </BHR_GT_O>
+</dispatchDocument>
+"""
+
+
+def bhr_gef(layers: int, seed: int = 0) -> str:
+    """Create a GEF-BORE file
+
+    Arguments:
+        layers (int): number of layers
+        seed (int): seed for the random generator
+
+    Returns:
+        str: gef file contents
+    """
+    rng = np.random.default_rng(seed)
+    boundaries = synthetic_layers(layers, seed)
+    lines = "".join(
+        f"{upper:.2f};{lower:.2f};'{code}';'toelichting';'grijs';\n"
+        for upper, lower, code in zip(
+            boundaries[:-1], boundaries[1:], rng.choice(SOIL_CODES, layers)
+        )
+    )
+    return f"""#GEFID= 1, 1, 0
+#FILEOWNER= Benchmark
+#FILEDATE= 2021, 03, 04
+#PROJECTID= 12345
+#COLUMN= 2
+#COLUMNINFO= 1, m, Laag van, 1
+#COLUMNINFO= 2, m, Laag tot, 2
+#COMPANYID= Boorbedrijf B.V., 12345678, 31
+#DATAFORMAT= ASCII
+#COLUMNSEPARATOR= ;
+#COLUMNVOID= 1, -9999.99
+#COLUMNVOID= 2, -9999.99
+#LASTSCAN= {layers}
+#XYID= 28992, 121000.00, 487000.00, 0.01, 0.01
+#ZID= 31000, 1.50, 0.01
+#TESTID= B{seed:04d}
+#MEASUREMENTTEXT= 6, Benchmark, projectnaam
+#REPORTCODE= GEF-BORE-Report, 1, 0, 0, -
+#EOH=
+{lines}"""
+
+
+def legacy_cpt_to_gef_string(cpt: XmlCpt) -> str:
+    """Row based GEF writer as it was before the columnar writer, used as a reference
+
+    Arguments:
+        cpt (XmlCpt): cpt to convert
+
+    Returns:
+        str: GEF string
+    """
+    has_u2 = cpt.data["porePressureU2"].notnull().count() > 0
+    s = cpt.gef_header()
+    for _, row in cpt.data.iterrows():
+        pl = row["penetrationLength"]
+        qc = row["coneResistance"]
+        de = row["depth"]
+        fs = row["localFriction"]
+        fr = row["frictionRatio"]
+        u2 = row["porePressureU2"]
+
+        if np.isnan(pl):
+            pl = 999
+        if np.isnan(qc):
+            qc = 999
+        if np.isnan(de):
+            de = 999
+        if np.isnan(fs):
+            fs = 999
+        if np.isnan(fr):
+            fr = 999
+        if np.isnan(u2):
+            u2 = 999
+
+        data_line = f"{pl:.3f};{qc:.3f};{de:.3f};{fs:.3f};{fr:.1f}"
+
+        if has_u2:
+            data_line += f";{u2:.3f}"
+
+        s += f"{data_line}\n"
+
+    return s
+
+
+def measure(function: Callable, setup: Callable, repeat: int = 3) -> Dict:
+    """Time a function and record its peak memory
+
+    The timing runs are done without tracemalloc, the peak memory is measured in a
+    separate run because tracemalloc slows down allocations.
+
+    Arguments:
+        function (Callable): function to measure, called with the result of setup
+        setup (Callable): creates a fresh argument for every run, not measured
+        repeat (int): number of timing runs, the fastest is reported
+
+    Returns:
+        Dict: fastest time in seconds and peak memory in bytes
+    """
+    timings = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - start)
+
+    argument = setup()
+    tracemalloc.start()
+    function(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": min(timings), "peak_bytes": peak}
+
+
+def loaded(cls, method: str, filename: str) -> Callable:
+    # maakt een setup functie die een ingelezen sondering of boring geeft
+    def setup():
+        test = cls()
+        getattr(test, method)(filename)
+        return test
+
+    return setup
+
+
+def run(
+    rows: List[int],
+    layers: List[int],
+    workdir: str,
+    repeat: int = 3,
+    plots: bool = True,
+    legacy: bool = False,
+) -> List[Dict]:
+    """Run all benchmarks on synthetic files
+
+    Arguments:
+        rows (List[int]): numbers of samples for the cpts
+        layers (List[int]): numbers of layers for the boreholes
+        workdir (str): directory for the synthetic files and plots
+        repeat (int): number of timing runs per benchmark
+        plots (bool): also measure the plot methods
+        legacy (bool): also measure the old row based GEF writer
+
+    Returns:
+        List[Dict]: one result per benchmark and size
+    """
+    output = os.path.join(workdir, "output")
+    os.makedirs(output, exist_ok=True)
+    results = []
+
+    def record(name, size, function, setup):
+        result = measure(function, setup, repeat)
+        results.append({"name": name, "size": size, **result})
+        print(f"{name:<32} {size:>7} {result['seconds']:>9.4f} s")
+
+    for size in rows:
+        xmlfile = os.path.join(workdir, f"cpt_{size}.xml")
+        geffile = os.path.join(workdir, f"cpt_{size}.gef")
+        with open(xmlfile, "w") as f:
+            f.write(cpt_xml(size, size))
+        with open(geffile, "w") as f:
+            f.write(cpt_gef(size, size))
+        from_xml = loaded(XmlCpt, "load_xml", xmlfile)
+        from_gef = loaded(XmlCpt, "load_gef", geffile)
+
+        record("XmlCpt.load_xml", size, lambda cpt: cpt.load_xml(xmlfile), XmlCpt)
+        record("XmlCpt.load_gef", size, lambda cpt: cpt.load_gef(geffile), XmlCpt)
+        record("XmlCpt.to_gef_string", size, XmlCpt.to_gef_string, from_xml)
+        if legacy:
+            record("legacy to_gef_string", size, legacy_cpt_to_gef_string, from_xml)
+        record("XmlCpt.interpret", size, XmlCpt.interpret, from_gef)
+        if plots:
+            record("XmlCpt.plot", size, lambda cpt: cpt.plot(output), from_gef)
+            record(
+                "XmlCpt.plot template",
+                size,
+                lambda cpt: cpt.plot(output, template=True),
+                from_gef,
+            )
+            record(
+                "XmlCpt.plot decimate",
+                size,
+                lambda cpt: cpt.plot(output, decimate=True),
+                from_gef,
+            )
+
+    for size in layers:
+        xmlfile = os.path.join(workdir, f"bhr_{size}.xml")
+        geffile = os.path.join(workdir, f"bhr_{size}.gef")
+        with open(xmlfile, "w") as f:
+            f.write(bhr_xml(size, size))
+        with open(geffile, "w") as f:
+            f.write(bhr_gef(size, size))
+        from_xml = loaded(XmlBorehole, "load_xml", xmlfile)
+        from_gef = loaded(XmlBorehole, "load_gef", geffile)
+
+        record("XmlBorehole.load_xml", size, lambda b: b.load_xml(xmlfile), XmlBorehole)
+        record("XmlBorehole.load_gef", size, lambda b: b.load_gef(geffile), XmlBorehole)
+        record("XmlBorehole.to_gef_string", size, XmlBorehole.to_gef_string, from_xml)
+        if plots:
+            record("XmlBorehole.plot", size, lambda b: b.plot(output), from_gef)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=CPT_ROWS)
+    parser.add_argument("--layers", type=int, nargs="+", default=BHR_LAYERS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-plots", action="store_true")
+    parser.add_argument(
+        "--legacy", action="store_true", help="meet ook de oude GEF schrijver"
+    )
+    parser.add_argument("--output", default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    if args.legacy:
+        # de nieuwe schrijver moet precies hetzelfde resultaat geven als de oude
+        cpt = synthetic_cpt(min(args.rows))
+        if legacy_cpt_to_gef_string(cpt) != cpt.to_gef_string():
+            raise AssertionError("to_gef_string wijkt af van de oude schrijver")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(
+            args.rows,
+            args.layers,
+            workdir,
+            args.repeat,
+            not args.no_plots,
+            args.legacy,
+        )
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "matplotlib": matplotlib.__version__,
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"resultaten in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
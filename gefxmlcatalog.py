@@ -0,0 +1,349 @@
+"""
+Catalogus van de sonderingen en boringen in een map, alleen op basis van de headers
+"""
+
+import argparse
+import os
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from gefxmlreader import (
+    GefFile,
+    XmlDispatcher,
+    gef_finaldepth,
+    set_gef_metadata,
+    xml_finaldepth,
+    xml_location,
+    xml_report_date,
+    xml_testid,
+    xml_vertical_position,
+)
+from xml2gef import case_insensitive_glob
+
+CATALOG_FILE = "./catalog.sqlite"
+SOURCE_DIR = "./testdata"
+# bestanden die in de catalogus komen
+CATALOG_EXTENSIONS = (".xml", ".gef")
+
+CATALOG_COLUMNS = [
+    "path",
+    "size",
+    "mtime",
+    "format",
+    "type",
+    "testid",
+    "easting",
+    "northing",
+    "groundlevel",
+    "date",
+    "finaldepth",
+    "companyid",
+    "projectid",
+    "projectname",
+    "error",
+]
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    format TEXT,
+    type TEXT,
+    testid TEXT,
+    easting REAL,
+    northing REAL,
+    groundlevel REAL,
+    date TEXT,
+    finaldepth REAL,
+    companyid TEXT,
+    projectid TEXT,
+    projectname TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tests_testid ON tests (testid);
+CREATE INDEX IF NOT EXISTS tests_location ON tests (easting, northing);
+CREATE INDEX IF NOT EXISTS tests_date ON tests (date);
+CREATE INDEX IF NOT EXISTS tests_finaldepth ON tests (finaldepth);
+CREATE INDEX IF NOT EXISTS tests_projectid ON tests (projectid);
+"""
+
+
+def xml_request_reference(header, element):
+    # projectkenmerk van de opdrachtgever, boringen zonder broId hebben alleen dit als kenmerk
+    header.projectid = element.text
+    if header.testid is None:
+        header.testid = element.text
+
+
+def xml_delivery_party(header, element):
+    # KvK-nummer van de aanleverende partij, staat in een onderliggend element
+    header.companyid = "".join(element.itertext()).strip() or None
+
+
+# alleen de metadata uit een BRO XML, de data komt pas na deze elementen
+HEADER_XML = XmlDispatcher(
+    {
+        "broId": xml_testid,
+        "requestReference": xml_request_reference,
+        "deliveryAccountableParty": xml_delivery_party,
+        "deliveredLocation": xml_location,
+        "deliveredVerticalPosition": xml_vertical_position,
+        "finalDepth": xml_finaldepth,
+        "finalDepthBoring": xml_finaldepth,
+        "researchReportDate": xml_report_date,
+        "descriptionReportDate": xml_report_date,
+    }
+)
+HEADER_XML_STOP = {
+    "conePenetrationTest": "cpt",
+    "descriptiveBoreholeLog": "borehole",
+}
+
+
+class Header:
+    # metadata van één bestand, met de attributen die de lezers in gefxmlreader vullen
+    def __init__(self):
+        self.type = None
+        self.testid = None
+        self.easting = None
+        self.northing = None
+        self.groundlevel = None
+        self.srid = None
+        self.date = None
+        self.finaldepth = None
+        self.companyid = None
+        self.projectid = None
+        self.projectname = None
+        self.columnseparator = " "
+        self.recordseparator = ""
+        self.columnvoid_values = {}
+
+
+def read_xml_header(xmlfile: str) -> Header:
+    """Read the metadata of a BRO XML, the file is read up to the data
+
+    Arguments:
+        xmlfile (str): BRO CPT or BHR-GT xml file
+
+    Returns:
+        Header: metadata of the test
+    """
+    header = Header()
+    stopped = HEADER_XML.parse(header, xmlfile, stop=HEADER_XML_STOP)
+    header.type = HEADER_XML_STOP.get(stopped)
+    return header
+
+
+def gef_type(gef: GefFile) -> Optional[str]:
+    # het soort GEF staat in de REPORTCODE of PROCEDURECODE
+    code = (
+        gef.header.first("REPORTCODE") or gef.header.first("PROCEDURECODE") or ""
+    ).upper()
+    if "BORE" in code:
+        return "borehole"
+    if "CPT" in code:
+        return "cpt"
+    return None
+
+
+def read_gef_header(geffile: str) -> Header:
+    """Read the metadata of a GEF, the data block is not parsed
+
+    Arguments:
+        geffile (str): GEF-CPT or GEF-BORE file
+
+    Returns:
+        Header: metadata of the test
+    """
+    header = Header()
+    with GefFile(geffile) as gef:
+        header.type = gef_type(gef)
+        # de GEFID wordt gebruikt als er geen TESTID is
+        header.testid = gef.header.first("GEFID")
+        set_gef_metadata(header, gef.header)
+
+        datekeys = ["FILEDATE"] if header.type == "borehole" else ["STARTDATE"]
+        for datekey in datekeys + ["FILEDATE"]:
+            try:
+                header.date = date(*[int(x) for x in gef.header.fields(datekey)[:3]])
+                break
+            except (TypeError, ValueError):
+                pass
+
+        # boringen: onderkant van de laag, sonderingen: diepte of anders sondeertrajectlengte
+        header.finaldepth = gef_finaldepth(
+            gef, header, ["2"] if header.type == "borehole" else ["11", "1"]
+        )
+    return header
+
+
+def read_header(filename: Path) -> Header:
+    """Read the metadata of a BRO XML or GEF
+
+    Arguments:
+        filename (Path): xml or gef file
+
+    Returns:
+        Header: metadata of the test
+    """
+    if filename.suffix.lower() == ".xml":
+        return read_xml_header(str(filename))
+    return read_gef_header(str(filename))
+
+
+def catalog_row(filename: Path, stat: os.stat_result) -> Tuple:
+    # regel voor de catalogus, een fout wordt opgeslagen zodat het bestand pas
+    # opnieuw gelezen wordt als het veranderd is
+    row = {
+        "path": str(filename),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "format": filename.suffix.lower().lstrip("."),
+    }
+    try:
+        header = read_header(filename)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    else:
+        row.update(
+            {
+                "type": header.type,
+                "testid": header.testid,
+                "easting": header.easting,
+                "northing": header.northing,
+                "groundlevel": header.groundlevel,
+                "date": None if header.date is None else header.date.isoformat()[:10],
+                "finaldepth": header.finaldepth,
+                "companyid": header.companyid,
+                "projectid": header.projectid,
+                "projectname": header.projectname,
+            }
+        )
+    return tuple(row.get(column) for column in CATALOG_COLUMNS)
+
+
+def open_catalog(catalog_file: str = CATALOG_FILE) -> sqlite3.Connection:
+    """Open or create a catalog
+
+    Arguments:
+        catalog_file (str): sqlite file
+
+    Returns:
+        sqlite3.Connection: connection to the catalog
+    """
+    connection = sqlite3.connect(catalog_file)
+    connection.executescript(CATALOG_SCHEMA)
+    return connection
+
+
+def scan(source: str) -> List[Path]:
+    """Find the xml and gef files in a directory (case insensitive)
+
+    Arguments:
+        source (str): directory to search, including subdirectories
+
+    Returns:
+        List[Path]: absolute paths of the files
+    """
+    return [
+        filename
+        for filename in case_insensitive_glob(source, CATALOG_EXTENSIONS)
+        if filename.is_file()
+    ]
+
+
+def refresh_catalog(connection: sqlite3.Connection, source: str) -> Dict:
+    """Bring the catalog up to date with a directory
+
+    Only new files and files with another size or mtime are read, files that no
+    longer exist are removed from the catalog.
+
+    Arguments:
+        connection (sqlite3.Connection): catalog
+        source (str): directory with xml and gef files
+
+    Returns:
+        Dict: number of added, updated, removed, unchanged and failed files
+    """
+    known = {
+        path: (size, mtime)
+        for path, size, mtime in connection.execute(
+            "SELECT path, size, mtime FROM tests"
+        )
+    }
+
+    summary = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+    rows = []
+    current = set()
+    for filename in scan(source):
+        path = str(filename)
+        current.add(path)
+        stat = filename.stat()
+        if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+            summary["unchanged"] += 1
+            continue
+        summary["updated" if path in known else "added"] += 1
+        row = catalog_row(filename, stat)
+        if row[-1] is not None:
+            summary["failed"] += 1
+        rows.append(row)
+
+    removed = [(path,) for path in known if path not in current]
+    summary["removed"] = len(removed)
+
+    with connection:
+        connection.executemany(
+            f"INSERT OR REPLACE INTO tests ({', '.join(CATALOG_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(CATALOG_COLUMNS))})",
+            rows,
+        )
+        connection.executemany("DELETE FROM tests WHERE path = ?", removed)
+    return summary
+
+
+def query_catalog(
+    connection: sqlite3.Connection, where: str = None, params: Tuple = ()
+) -> pd.DataFrame:
+    """Select tests from the catalog
+
+    Arguments:
+        connection (sqlite3.Connection): catalog
+        where (str): sql condition, for example "type = 'cpt' AND finaldepth > ? AND date >= ?"
+        params (Tuple): values for the placeholders in where, for example (30, "2015-01-01")
+
+    Returns:
+        pd.DataFrame: one row per file
+    """
+    sql = "SELECT * FROM tests"
+    if where:
+        sql += f" WHERE {where}"
+    return pd.read_sql_query(sql, connection, params=params)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Maak of vernieuw een catalogus van sonderingen en boringen"
+    )
+    parser.add_argument("--source", default=SOURCE_DIR)
+    parser.add_argument("--catalog", default=CATALOG_FILE)
+    parser.add_argument("--where", help="sql voorwaarde, bijvoorbeeld finaldepth > 30")
+    args = parser.parse_args()
+
+    connection = open_catalog(args.catalog)
+    summary = refresh_catalog(connection, args.source)
+    print(
+        f"{summary['added']} toegevoegd, {summary['updated']} gewijzigd, "
+        f"{summary['removed']} verwijderd, {summary['unchanged']} ongewijzigd, "
+        f"{summary['failed']} mislukt"
+    )
+    if args.where:
+        print(query_catalog(connection, args.where).to_string())
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Ruimtelijke index om sonderingen en boringen in de buurt van een locatie te vinden
+"""
+
+from typing import Iterable, List, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# punten die na het bouwen van de boom zijn toegevoegd worden apart doorzocht
+# als de buffer vol is wordt de boom opnieuw gebouwd, de buffer groeit mee tot 10% van de boom
+BUFFER_SIZE = 4096
+
+
+def index_file(path: str) -> str:
+    # np.savez voegt .npz toe als het bestand geen .npz heeft, bij het lezen ook
+    path = str(path)
+    return path if path.endswith(".npz") else f"{path}.npz"
+
+
+def in_bbox(points, xmin, ymin, xmax, ymax):
+    return (
+        (points[:, 0] >= xmin)
+        & (points[:, 0] <= xmax)
+        & (points[:, 1] >= ymin)
+        & (points[:, 1] <= ymax)
+    )
+
+
+class SpatialIndex:
+    """KD-tree over the RD coordinates (EPSG:28992) of cpts and boreholes
+
+    Tests are identified by a key, by default the testid. New tests are kept in a
+    buffer that is searched by brute force, the tree is rebuilt when the buffer is full.
+    """
+
+    def __init__(self, tests: Iterable = (), buffer_size: int = BUFFER_SIZE):
+        """
+        Arguments:
+            tests (Iterable): XmlCpt and XmlBorehole objects to add
+            buffer_size (int): minimum number of tests that can be added before a rebuild
+        """
+        self.buffer_size = buffer_size
+        self.points = np.empty((0, 2))
+        self.keys = np.empty(0, dtype=object)
+        self.tree = cKDTree(self.points)
+        self.buffer_points = np.empty((buffer_size, 2))
+        self.buffer_keys = []
+        self.insert_many(tests)
+
+    def __len__(self):
+        return len(self.keys) + len(self.buffer_keys)
+
+    def add(self, key, easting: float, northing: float):
+        """Add a location
+
+        Arguments:
+            key: identifier that is returned by the queries
+            easting (float): x in RD
+            northing (float): y in RD
+        """
+        self.buffer_points[len(self.buffer_keys)] = easting, northing
+        self.buffer_keys.append(key)
+        if len(self.buffer_keys) == len(self.buffer_points):
+            self.rebuild()
+
+    def add_many(self, keys: List, points: np.ndarray):
+        """Add many locations, more than fit in the buffer are added with one rebuild
+
+        Arguments:
+            keys (List): identifiers that are returned by the queries
+            points (np.ndarray): easting and northing in RD, one row per key
+        """
+        if len(keys) < len(self.buffer_points) - len(self.buffer_keys):
+            for key, (easting, northing) in zip(keys, points):
+                self.add(key, easting, northing)
+            return
+        self.rebuild(keys, points)
+
+    def insert(self, test) -> bool:
+        """Add a cpt or borehole, tests without coordinates are skipped
+
+        Arguments:
+            test (XmlCpt | XmlBorehole): test to add, the testid is used as key
+
+        Returns:
+            bool: True if the test was added
+        """
+        if test.easting is None or test.northing is None:
+            return False
+        self.add(test.testid, test.easting, test.northing)
+        return True
+
+    def insert_many(self, tests: Iterable) -> int:
+        """Add cpts and boreholes, tests without coordinates are skipped
+
+        Arguments:
+            tests (Iterable): XmlCpt and XmlBorehole objects
+
+        Returns:
+            int: number of added tests
+        """
+        located = [
+            test
+            for test in tests
+            if test.easting is not None and test.northing is not None
+        ]
+        self.add_many(
+            [test.testid for test in located],
+            np.array([(test.easting, test.northing) for test in located]).reshape(
+                -1, 2
+            ),
+        )
+        return len(located)
+
+    def rebuild(self, keys: List = (), points: np.ndarray = None):
+        """Move the buffered locations and the given locations into the tree
+
+        Arguments:
+            keys (List): identifiers of extra locations
+            points (np.ndarray): easting and northing of extra locations in RD
+        """
+        if not self.buffer_keys and not len(keys):
+            return
+        extra = np.empty((0, 2)) if points is None else np.asarray(points, dtype=float)
+        self.points = np.concatenate(
+            [self.points, self.buffer_points[: len(self.buffer_keys)], extra]
+        )
+        self.keys = np.concatenate(
+            [
+                self.keys,
+                np.array(self.buffer_keys, dtype=object),
+                np.array(keys, dtype=object),
+            ]
+        )
+        self.buffer_keys = []
+        self.buffer_points = np.empty((max(self.buffer_size, len(self.keys) // 10), 2))
+        self.tree = cKDTree(self.points)
+
+    def buffered(self) -> np.ndarray:
+        # de punten die nog niet in de boom zitten
+        return self.buffer_points[: len(self.buffer_keys)]
+
+    def buffered_distances(self, easting: float, northing: float) -> np.ndarray:
+        # kwadraat van de afstanden van de punten in de buffer tot een punt
+        points = self.buffered()
+        dx = points[:, 0] - easting
+        dy = points[:, 1] - northing
+        return dx * dx + dy * dy
+
+    def nearest(self, easting: float, northing: float, k: int = 1) -> List[Tuple]:
+        """Find the nearest tests
+
+        Arguments:
+            easting (float): x in RD
+            northing (float): y in RD
+            k (int): number of tests
+
+        Returns:
+            List[Tuple]: (key, distance) for at most k tests, nearest first
+        """
+        candidates = []
+        if len(self.keys) > 0:
+            distances, indices = self.tree.query(
+                (easting, northing), k=min(k, len(self.keys))
+            )
+            distances, indices = np.atleast_1d(distances), np.atleast_1d(indices)
+            candidates.extend(zip(self.keys[indices], distances))
+        if self.buffer_keys:
+            distances = self.buffered_distances(easting, northing)
+            nearest = (
+                np.argpartition(distances, k)[:k]
+                if k < len(distances)
+                else np.arange(len(distances))
+            )
+            candidates.extend(
+                (self.buffer_keys[i], np.sqrt(distances[i])) for i in nearest.tolist()
+            )
+        candidates.sort(key=lambda candidate: candidate[1])
+        return [(key, float(distance)) for key, distance in candidates[:k]]
+
+    def radius(self, easting: float, northing: float, r: float) -> List:
+        """Find the tests within a distance
+
+        Arguments:
+            easting (float): x in RD
+            northing (float): y in RD
+            r (float): distance in m
+
+        Returns:
+            List: keys of the tests within the distance
+        """
+        result = list(self.keys[self.tree.query_ball_point((easting, northing), r)])
+        if self.buffer_keys:
+            distances = self.buffered_distances(easting, northing)
+            result.extend(
+                self.buffer_keys[i] for i in np.flatnonzero(distances <= r * r).tolist()
+            )
+        return result
+
+    def bbox(self, xmin: float, ymin: float, xmax: float, ymax: float) -> List:
+        """Find the tests within a rectangle
+
+        Arguments:
+            xmin (float): minimum x in RD
+            ymin (float): minimum y in RD
+            xmax (float): maximum x in RD
+            ymax (float): maximum y in RD
+
+        Returns:
+            List: keys of the tests within the rectangle, edges included
+        """
+        result = []
+        if len(self.keys) > 0:
+            # het vierkant om de rechthoek uit de boom, daarna de rechthoek zelf
+            center = ((xmin + xmax) / 2, (ymin + ymax) / 2)
+            r = max(xmax - xmin, ymax - ymin) / 2
+            indices = np.array(
+                self.tree.query_ball_point(center, r, p=np.inf), dtype=int
+            )
+            inside = in_bbox(self.points[indices], xmin, ymin, xmax, ymax)
+            result.extend(self.keys[indices[inside]])
+        if self.buffer_keys:
+            inside = in_bbox(self.buffered(), xmin, ymin, xmax, ymax)
+            result.extend(self.buffer_keys[i] for i in np.flatnonzero(inside).tolist())
+        return result
+
+    def save(self, path: str):
+        """Save the index to a .npz file, the buffer is included
+
+        Only string keys can be saved, such as the testids, so that load returns
+        the same keys. Other keys raise a TypeError.
+
+        Arguments:
+            path (str): file to write, .npz is added when missing
+        """
+        self.rebuild()
+        wrong = [key for key in self.keys if not isinstance(key, str)]
+        if wrong:
+            raise TypeError(
+                f"alleen tekst als sleutel kan opgeslagen worden, niet {wrong[0]!r}"
+            )
+        np.savez(index_file(path), points=self.points, keys=self.keys.astype(str))
+
+    @classmethod
+    def load(cls, path: str, buffer_size: int = BUFFER_SIZE) -> "SpatialIndex":
+        """Load an index saved with save
+
+        Arguments:
+            path (str): file to read, .npz is added when missing
+            buffer_size (int): minimum number of tests that can be added before a rebuild
+
+        Returns:
+            SpatialIndex: index with the saved locations
+        """
+        index = cls(buffer_size=buffer_size)
+        with np.load(index_file(path)) as saved:
+            index.points = saved["points"]
+            index.keys = saved["keys"].astype(object)
+        index.buffer_points = np.empty((max(buffer_size, len(index.keys) // 10), 2))
+        index.tree = cKDTree(index.points)
+        return index
@@ -0,0 +1,465 @@
+"""
+Sonderingen en boringen opslaan als Parquet dataset en weer inlezen
+"""
+
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from gefxmlreader import XmlBorehole, XmlCpt, soil_layer_components
+
+# metadata per sondering of boring, één regel per test
+METADATA_COLUMNS = [
+    "testid",
+    "type",
+    "easting",
+    "northing",
+    "groundlevel",
+    "date",
+    "finaldepth",
+    "companyid",
+    "projectid",
+    "projectname",
+]
+# vaste schema's, zodat batches met bijvoorbeeld alleen lege companyid's samen gelezen kunnen worden
+METADATA_SCHEMA = pa.schema(
+    [
+        ("testid", pa.string()),
+        ("type", pa.string()),
+        ("easting", pa.float64()),
+        ("northing", pa.float64()),
+        ("groundlevel", pa.float64()),
+        ("date", pa.timestamp("ns")),
+        ("finaldepth", pa.float64()),
+        ("companyid", pa.string()),
+        ("projectid", pa.string()),
+        ("projectname", pa.string()),
+    ]
+)
+MEASUREMENTS_SCHEMA = pa.schema(
+    [
+        ("testid", pa.dictionary(pa.int32(), pa.string())),
+        ("projectid", pa.dictionary(pa.int32(), pa.string())),
+        ("sample", pa.int32()),
+        ("depth", pa.float64()),
+        ("parameter", pa.string()),
+        ("value", pa.float64()),
+    ]
+)
+# de kolommen van lagen verschillen per boring, daarom staan ze in maps
+LAYERS_SCHEMA = pa.schema(
+    [
+        ("testid", pa.string()),
+        ("descriptionLocation", pa.string()),
+        ("layer", pa.int32()),
+        ("numbers", pa.map_(pa.string(), pa.float64())),
+        ("texts", pa.map_(pa.string(), pa.string())),
+        ("componentFractions", pa.list_(pa.float64())),
+        ("componentCodes", pa.list_(pa.int8())),
+    ]
+)
+# mappen in de dataset, de metingen zijn per grootheid opgedeeld
+METADATA_DIR = "metadata"
+MEASUREMENTS_DIR = "measurements"
+LAYERS_DIR = "layers"
+
+
+def metadata_table(tests: List) -> pd.DataFrame:
+    """Collect the header metadata of cpts and boreholes
+
+    Arguments:
+        tests (List): XmlCpt and XmlBorehole objects
+
+    Returns:
+        pd.DataFrame: one row per test with the columns in METADATA_COLUMNS
+    """
+    rows = [
+        {
+            "testid": test.testid,
+            "type": "cpt" if isinstance(test, XmlCpt) else "borehole",
+            "easting": test.easting,
+            "northing": test.northing,
+            "groundlevel": test.groundlevel,
+            "date": test.date,
+            "finaldepth": test.finaldepth,
+            "companyid": test.companyid,
+            "projectid": test.projectid,
+            "projectname": test.projectname,
+        }
+        for test in tests
+    ]
+    metadata = pd.DataFrame(rows, columns=METADATA_COLUMNS)
+    for column in ["easting", "northing", "groundlevel", "finaldepth"]:
+        metadata[column] = pd.to_numeric(metadata[column])
+    metadata["date"] = pd.to_datetime(metadata["date"])
+    for column in ["testid", "companyid", "projectid", "projectname"]:
+        metadata[column] = metadata[column].map(str, na_action="ignore")
+    return metadata
+
+
+def measurements_table(cpts: List[XmlCpt]) -> pd.DataFrame:
+    """Convert the data of cpts to long format, one row per value
+
+    Only numeric columns are stored, interpretations can be calculated again. Missing
+    values are left out.
+
+    Arguments:
+        cpts (List[XmlCpt]): cpts with data
+
+    Returns:
+        pd.DataFrame: testid, projectid, sample, depth, parameter and value
+    """
+    testids, projectids, samples, depths, parameters, values = [], [], [], [], [], []
+    for cpt in cpts:
+        columns = [
+            column
+            for column in cpt.data.columns
+            if column != "depth" and pd.api.types.is_float_dtype(cpt.data[column])
+        ]
+        n = len(cpt.data)
+        # kolom voor kolom achter elkaar, dan staan de waarden van een grootheid bij elkaar
+        value = cpt.data[columns].to_numpy(dtype=float).T.ravel()
+        present = ~np.isnan(value)
+        testids.append(np.full(present.sum(), str(cpt.testid), dtype=object))
+        projectids.append(np.full(present.sum(), cpt.projectid, dtype=object))
+        samples.append(np.tile(np.arange(n, dtype=np.int32), len(columns))[present])
+        depths.append(np.tile(cpt.measurement("depth"), len(columns))[present])
+        parameters.append(np.repeat(np.array(columns, dtype=object), n)[present])
+        values.append(value[present])
+
+    # alles in één keer samenvoegen, testid en projectid zijn categorieën
+    return pd.DataFrame(
+        {
+            "testid": pd.Categorical(np.concatenate(testids)),
+            "projectid": pd.Categorical(np.concatenate(projectids)),
+            "sample": np.concatenate(samples),
+            "depth": np.concatenate(depths),
+            "parameter": np.concatenate(parameters),
+            "value": np.concatenate(values),
+        }
+    )
+
+
+def layers_table(boreholes: List[XmlBorehole]) -> pd.DataFrame:
+    """Combine the soil layers of boreholes into one table
+
+    The columns of the soil layers differ per borehole, numeric columns are stored in
+    the map numbers and other columns in the map texts.
+
+    Arguments:
+        boreholes (List[XmlBorehole]): boreholes with soil layers
+
+    Returns:
+        pd.DataFrame: one row per layer with the columns in LAYERS_SCHEMA,
+            the components are stored as lists of fractions and material numbers
+    """
+    rows = []
+    for borehole in boreholes:
+        for descriptionLocation, soillayers in borehole.soillayers.items():
+            columns = [
+                column for column in soillayers.columns if column != "components"
+            ]
+            numeric = [
+                column
+                for column in columns
+                if pd.api.types.is_numeric_dtype(soillayers[column])
+            ]
+            texts = [column for column in columns if column not in numeric]
+            pairs = soil_layer_components(soillayers)
+            for layer, row in enumerate(soillayers.to_dict("records")):
+                rows.append(
+                    {
+                        "testid": str(borehole.testid),
+                        "descriptionLocation": str(descriptionLocation),
+                        "layer": layer,
+                        "numbers": [
+                            (column, float(row[column]))
+                            for column in numeric
+                            if not pd.isna(row[column])
+                        ],
+                        "texts": [
+                            (column, str(row[column]))
+                            for column in texts
+                            if not pd.isna(row[column])
+                        ],
+                        # lagen met een onbekende grondsoort hebben geen componenten
+                        "componentFractions": None
+                        if pairs[layer] is None
+                        else [fraction for fraction, _ in pairs[layer]],
+                        "componentCodes": None
+                        if pairs[layer] is None
+                        else [code for _, code in pairs[layer]],
+                    }
+                )
+    return pd.DataFrame(rows, columns=LAYERS_SCHEMA.names)
+
+
+def remove_tests(directory: Path, testids: List[str]):
+    # haal eerder geschreven regels van deze tests uit de dataset, alleen bestanden
+    # waarin een van de tests voorkomt worden herschreven of verwijderd
+    if not directory.exists():
+        return
+    testids = pa.array(testids, type=pa.string())
+    for filename in directory.glob("**/*.parquet"):
+        present = pq.read_table(filename, columns=["testid"], partitioning=None)
+        if not pc.any(pc.is_in(present["testid"].cast(pa.string()), testids)).as_py():
+            continue
+        table = pq.read_table(filename, partitioning=None)
+        keep = pc.invert(pc.is_in(table["testid"].cast(pa.string()), testids))
+        table = table.filter(keep)
+        if table.num_rows:
+            pq.write_table(table, filename)
+        else:
+            filename.unlink()
+
+
+def write_table(
+    df: pd.DataFrame,
+    directory: Path,
+    schema: pa.Schema,
+    partitioning: List[str] = None,
+):
+    """Add a table to a dataset directory without overwriting earlier batches
+
+    Arguments:
+        df (pd.DataFrame): table to write
+        directory (Path): directory of the dataset
+        schema (pa.Schema): schema of the table
+        partitioning (List[str]): columns to partition by (hive style: column=value)
+    """
+    ds.write_dataset(
+        pa.Table.from_pandas(df, schema=schema, preserve_index=False),
+        directory,
+        format="parquet",
+        partitioning=partitioning,
+        partitioning_flavor="hive" if partitioning else None,
+        # unieke namen, zodat een volgende batch wordt toegevoegd
+        basename_template=f"{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def write_dataset(tests: List, root: str) -> Dict:
+    """Write cpts and boreholes to a partitioned Parquet dataset
+
+    The dataset consists of a metadata table, the cpt measurements in long format
+    partitioned by parameter and the soil layers of the boreholes. Calling this
+    again with another batch adds the batch to the dataset, tests that are already
+    in the dataset (same testid) are replaced. Within a batch the last test with a
+    testid is written.
+
+    Arguments:
+        tests (List): XmlCpt and XmlBorehole objects
+        root (str): directory of the dataset
+
+    Returns:
+        Dict: number of written tests, measurements and layers
+    """
+    root = Path(root)
+    # één test per testid, de laatste telt
+    tests = list({str(test.testid): test for test in tests}.values())
+    cpts = [test for test in tests if isinstance(test, XmlCpt)]
+    boreholes = [test for test in tests if isinstance(test, XmlBorehole)]
+
+    summary = {"tests": len(tests), "measurements": 0, "layers": 0}
+    testids = [str(test.testid) for test in tests]
+    for directory in [METADATA_DIR, MEASUREMENTS_DIR, LAYERS_DIR]:
+        remove_tests(root / directory, testids)
+    if tests:
+        write_table(metadata_table(tests), root / METADATA_DIR, METADATA_SCHEMA)
+    if cpts:
+        measurements = measurements_table(cpts)
+        write_table(
+            measurements, root / MEASUREMENTS_DIR, MEASUREMENTS_SCHEMA, ["parameter"]
+        )
+        summary["measurements"] = len(measurements)
+    if boreholes:
+        layers = layers_table(boreholes)
+        write_table(layers, root / LAYERS_DIR, LAYERS_SCHEMA)
+        summary["layers"] = len(layers)
+    return summary
+
+
+def read_table(
+    directory: Path, columns: List[str] = None, filters: List = None
+) -> pd.DataFrame:
+    # alleen de gevraagde kolommen en de bestanden en row groups die aan de filters kunnen voldoen worden gelezen
+    if not directory.exists():
+        return pd.DataFrame(columns=columns)
+    return pq.read_table(directory, columns=columns, filters=filters).to_pandas()
+
+
+def read_metadata(
+    root: str, columns: List[str] = None, filters: List = None
+) -> pd.DataFrame:
+    """Read the metadata table of a dataset
+
+    Arguments:
+        root (str): directory of the dataset
+        columns (List[str]): columns to read, all columns if None
+        filters (List): pyarrow filters, for example [("projectid", "=", "1234")]
+
+    Returns:
+        pd.DataFrame: one row per test
+    """
+    return read_table(Path(root) / METADATA_DIR, columns, filters)
+
+
+def read_measurements(
+    root: str,
+    parameters: List[str] = None,
+    columns: List[str] = None,
+    filters: List = None,
+) -> pd.DataFrame:
+    """Read cpt measurements in long format, only the requested partitions are read
+
+    Arguments:
+        root (str): directory of the dataset
+        parameters (List[str]): parameters to read, for example ["coneResistance"]
+        columns (List[str]): columns to read, all columns if None
+        filters (List): pyarrow filters, for example [("projectid", "=", "1234")]
+
+    Returns:
+        pd.DataFrame: testid, projectid, sample, depth, parameter and value
+    """
+    filters = list(filters or [])
+    if parameters is not None:
+        filters.append(("parameter", "in", list(parameters)))
+    return read_table(Path(root) / MEASUREMENTS_DIR, columns, filters or None)
+
+
+def read_layers(
+    root: str, columns: List[str] = None, filters: List = None
+) -> pd.DataFrame:
+    """Read borehole soil layers
+
+    Arguments:
+        root (str): directory of the dataset
+        columns (List[str]): columns to read, all columns if None
+        filters (List): pyarrow filters, for example [("testid", "in", ["B1", "B2"])]
+
+    Returns:
+        pd.DataFrame: one row per layer
+    """
+    return read_table(Path(root) / LAYERS_DIR, columns, filters)
+
+
+def layers_frame(layers: pd.DataFrame) -> pd.DataFrame:
+    # zet de lagen van één boring terug in de vorm van XmlBorehole.soillayers
+    soillayers = pd.DataFrame(
+        [
+            {**dict(numbers), **dict(texts)}
+            for numbers, texts in zip(layers["numbers"], layers["texts"])
+        ]
+    )
+    # lagen uit een BRO XML hebben soilCode, dan volgen de componenten daaruit
+    if (
+        "soilCode" not in soillayers.columns
+        and layers["componentCodes"].notnull().any()
+    ):
+        soillayers["components"] = [
+            np.nan if codes is None else dict(zip(fractions, codes))
+            for fractions, codes in zip(
+                layers["componentFractions"], layers["componentCodes"]
+            )
+        ]
+    return soillayers
+
+
+def set_metadata(test, row):
+    # zet de metadata uit een regel van de metadata tabel terug op een test
+    for column in METADATA_COLUMNS:
+        if column == "type":
+            continue
+        value = getattr(row, column)
+        if column == "date":
+            value = None if pd.isna(value) else value.to_pydatetime()
+        elif value is not None and pd.isna(value):
+            value = None
+        setattr(test, column, value)
+
+
+def read_cpts(
+    root: str, parameters: List[str] = None, filters: List = None
+) -> List[XmlCpt]:
+    """Read cpts back from a dataset
+
+    Arguments:
+        root (str): directory of the dataset
+        parameters (List[str]): parameters to read, all if None, depth is always read
+        filters (List): pyarrow filters on the metadata, for example [("projectid", "=", "1234")]
+
+    Returns:
+        List[XmlCpt]: cpts with metadata and data in wide format
+    """
+    metadata = read_metadata(root, filters=list(filters or []) + [("type", "=", "cpt")])
+    if metadata.empty:
+        return []
+
+    measurements = read_measurements(
+        root,
+        parameters,
+        columns=["testid", "sample", "depth", "parameter", "value"],
+        filters=[("testid", "in", metadata["testid"].tolist())],
+    )
+    measurements["testid"] = measurements["testid"].astype(str)
+    measurements["parameter"] = measurements["parameter"].astype(str)
+
+    # terug naar één kolom per grootheid
+    data = measurements.pivot(
+        index=["testid", "sample"], columns="parameter", values="value"
+    )
+    data["depth"] = measurements.groupby(["testid", "sample"])["depth"].first()
+    data.columns.name = None
+    groups = dict(tuple(data.groupby(level="testid")))
+
+    cpts = []
+    for row in metadata.itertuples():
+        cpt = XmlCpt()
+        set_metadata(cpt, row)
+        if row.testid in groups:
+            cpt.data = groups[row.testid].reset_index(drop=True)
+        else:
+            cpt.data = pd.DataFrame(columns=["depth"], dtype=float)
+        cpts.append(cpt)
+    return cpts
+
+
+def read_boreholes(root: str, filters: List = None) -> List[XmlBorehole]:
+    """Read boreholes back from a dataset
+
+    Arguments:
+        root (str): directory of the dataset
+        filters (List): pyarrow filters on the metadata, for example [("projectid", "=", "1234")]
+
+    Returns:
+        List[XmlBorehole]: boreholes with metadata and soil layers per descriptionLocation
+    """
+    metadata = read_metadata(
+        root, filters=list(filters or []) + [("type", "=", "borehole")]
+    )
+    if metadata.empty:
+        return []
+
+    layers = read_layers(root, filters=[("testid", "in", metadata["testid"].tolist())])
+    layers = layers.sort_values(["testid", "descriptionLocation", "layer"])
+
+    boreholes = []
+    for row in metadata.itertuples():
+        borehole = XmlBorehole()
+        set_metadata(borehole, row)
+        boreholes.append(borehole)
+    by_testid = {borehole.testid: borehole for borehole in boreholes}
+
+    for (testid, descriptionLocation), group in layers.groupby(
+        ["testid", "descriptionLocation"], sort=False
+    ):
+        by_testid[testid].soillayers[descriptionLocation] = layers_frame(group)
+    return boreholes
@@ -0,0 +1,177 @@
+"""
+Plot veel sonderingen en boringen tegelijk in een pool van processen of threads
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from tqdm import tqdm
+
+from gefxmlcatalog import HEADER_XML_STOP, gef_type, scan
+from gefxmlreader import GefFile, XmlBorehole, XmlCpt, XmlDispatcher
+
+SOURCE_DIR = "./testdata"
+OUTPUT_DIR = "./output"
+# aantal tests dat in één keer naar een worker gaat
+CHUNKSIZE = 16
+EXECUTORS = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}
+# zoekt in een BRO XML alleen het soort test
+TYPE_XML = XmlDispatcher({})
+
+
+def load_test(filename: Path):
+    """Load a cpt or borehole, the type is read from the file before the data
+
+    Arguments:
+        filename (Path): BRO XML or GEF file
+
+    Returns:
+        XmlCpt | XmlBorehole: the loaded test
+    """
+    filename = Path(filename)
+    if filename.suffix.lower() == ".xml":
+        # alleen lezen tot het begin van de metingen of lagen, de metadata wordt niet verwerkt
+        stopped = TYPE_XML.parse(None, str(filename), stop=HEADER_XML_STOP)
+        test = XmlBorehole() if HEADER_XML_STOP.get(stopped) == "borehole" else XmlCpt()
+        test.load_xml(str(filename))
+        return test
+
+    # de header wordt één keer gelezen, load_gef gebruikt het geopende bestand
+    # een GEF zonder REPORTCODE of PROCEDURECODE wordt als sondering gelezen
+    gef = GefFile(str(filename))
+    test = XmlBorehole() if gef_type(gef) == "borehole" else XmlCpt()
+    test.load_gef(gef)
+    return test
+
+
+def plot_test(
+    test, path: str, template: bool = False, decimate: bool = False
+) -> Tuple[str, Optional[str], Optional[str]]:
+    """Plot a single test, errors are returned, not raised
+
+    Arguments:
+        test (XmlCpt | XmlBorehole | Path): test or file to plot, files are loaded in the worker
+        path (str): directory for the png
+        template (bool): reuse the figure of an earlier cpt with the same layout
+        decimate (bool): only draw the first, last, minimum and maximum sample per pixel row of a cpt
+
+    Returns:
+        Tuple(str, str, str): test, png file or None and the error message or None on success
+    """
+    name = str(test) if isinstance(test, (str, Path)) else test.testid
+    try:
+        if isinstance(test, (str, Path)):
+            test = load_test(test)
+        if isinstance(test, XmlCpt):
+            return name, test.plot(path, template, decimate), None
+        return name, test.plot(path), None
+    except Exception as e:
+        return name, None, f"{type(e).__name__}: {e}"
+
+
+def plot_many(
+    tests: Iterable,
+    path: str = OUTPUT_DIR,
+    workers: Optional[int] = None,
+    executor: str = "process",
+    chunksize: int = CHUNKSIZE,
+    template: bool = True,
+    decimate: bool = False,
+) -> Dict:
+    """Plot cpts and boreholes using a pool of workers
+
+    Every plot has its own figure, so the workers do not share any matplotlib state.
+    Files are cheaper to send to a process than loaded tests, they are loaded in the worker.
+
+    Arguments:
+        tests (Iterable): XmlCpt and XmlBorehole objects or xml and gef files
+        path (str): directory for the png files, created if it does not exist
+        workers (int): number of workers, 1 plots in the current process
+        executor (str): "process" or "thread"
+        chunksize (int): number of tests that is sent to a worker process at once
+        template (bool): every worker reuses one cpt figure per layout
+        decimate (bool): reduce dense cpts to the samples that are visible per pixel row
+
+    Returns:
+        Dict: summary with the number of tests, plotted tests, errors per test,
+            png per test, the time in seconds and the number of plots per second
+    """
+    tests = list(tests)
+    os.makedirs(path, exist_ok=True)
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = map(
+            plot_test, tests, repeat(path), repeat(template), repeat(decimate)
+        )
+        results = list(tqdm(results, total=len(tests)))
+    else:
+        with EXECUTORS[executor](max_workers=workers) as pool:
+            results = pool.map(
+                plot_test,
+                tests,
+                repeat(path),
+                repeat(template),
+                repeat(decimate),
+                chunksize=chunksize,
+            )
+            results = list(tqdm(results, total=len(tests)))
+    seconds = time.perf_counter() - start
+
+    failed = {name: error for name, _, error in results if error is not None}
+    outputs = {name: png for name, png, error in results if error is None}
+    return {
+        "total": len(results),
+        "plotted": len(outputs),
+        "failed": failed,
+        "outputs": outputs,
+        "seconds": seconds,
+        "per_second": len(results) / seconds if seconds > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Plot alle sonderingen en boringen in een map"
+    )
+    parser.add_argument("--source", default=SOURCE_DIR)
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--executor", choices=sorted(EXECUTORS), default="process")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument(
+        "--no-template",
+        action="store_true",
+        help="maak voor elke sondering een nieuwe figuur",
+    )
+    parser.add_argument(
+        "--decimate",
+        action="store_true",
+        help="teken van dichte sonderingen alleen wat per pixelrij zichtbaar is",
+    )
+    args = parser.parse_args()
+
+    summary = plot_many(
+        scan(args.source),
+        args.output,
+        args.workers,
+        args.executor,
+        args.chunksize,
+        not args.no_template,
+        args.decimate,
+    )
+    for name, error in summary["failed"].items():
+        print(f"{name}: {error}")
+    print(
+        f"{summary['plotted']} van {summary['total']} geplot in "
+        f"{summary['seconds']:.1f} s ({summary['per_second']:.1f} per seconde)"
+    )
+
+
+if __name__ == "__main__":
+    main()
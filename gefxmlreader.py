@@ -10,21 +10,1106 @@ __maintainer__ = "Thomas van der Linden"
 __email__ = "t.van.der.linden@amsterdam.nl"
 __status__ = "Dev"
 
-from dataclasses import dataclass
-from typing import OrderedDict
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from typing import Dict, List, OrderedDict
 import pandas as pd
-from io import StringIO
+from io import StringIO, TextIOWrapper
 import numpy as np
+import mmap
 import re
+import threading
+import zipfile
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
 from matplotlib.gridspec import GridSpec
-import matplotlib.pyplot as plt
 from datetime import date, datetime
 from pyproj import Transformer
-from xml.etree.ElementTree import ElementTree
+from xml.etree.ElementTree import iterparse
+
+
+# void waarde en kolommen die naar GEF-CPT geschreven worden
+GEF_VOID = 999
+GEF_CPT_COLUMNS = [
+    "penetrationLength",
+    "coneResistance",
+    "depth",
+    "localFriction",
+    "frictionRatio",
+    "porePressureU2",
+]
+GEF_CPT_FORMATS = ["%.3f", "%.3f", "%.3f", "%.3f", "%.1f", "%.3f"]
+
+# aantal regels dat in één keer geformatteerd en geschreven wordt
+GEF_CHUNKSIZE = 10000
+
+
+def write_records(f, record_format, columns, chunksize=GEF_CHUNKSIZE):
+    # schrijf kolommen regel voor regel naar een open bestand
+    # per blok wordt de format string herhaald en in één keer gevuld,
+    # dan hoeft er niet per regel in Python geformatteerd te worden
+    nrows = len(columns[0]) if len(columns) > 0 else 0
+    for start in range(0, nrows, chunksize):
+        stop = min(start + chunksize, nrows)
+        block = np.empty((stop - start, len(columns)), dtype=object)
+        for i, column in enumerate(columns):
+            block[:, i] = column[start:stop]
+        f.write((record_format * (stop - start)) % tuple(block.ravel().tolist()))
+
+
+# kolommen in het values blok van een BRO CPT, in deze volgorde
+BRO_CPT_COLUMNS = [
+    "penetrationLength",
+    "depth",
+    "elapsedTime",
+    "coneResistance",
+    "correctedConeResistance",
+    "netConeResistance",
+    "magneticFieldStrengthX",
+    "magneticFieldStrengthY",
+    "magneticFieldStrengthZ",
+    "magneticFieldStrengthTotal",
+    "electricalConductivity",
+    "inclinationEW",
+    "inclinationNS",
+    "inclinationX",
+    "inclinationY",
+    "inclinationResultant",
+    "magneticInclination",
+    "magneticDeclination",
+    "localFriction",
+    "poreRatio",
+    "temperature",
+    "porePressureU1",
+    "porePressureU2",
+    "porePressureU3",
+    "frictionRatio",
+]
+BRO_VOID = -999999
+# kolommen die bij compact inlezen altijd bewaard worden, ook als ze leeg zijn
+BRO_CPT_REQUIRED = [
+    "penetrationLength",
+    "depth",
+    "coneResistance",
+    "localFriction",
+    "frictionRatio",
+]
+
+
+def split_records(text, separator=";"):
+    # geef de regels uit een blok tekst één voor één terug,
+    # zonder eerst het hele blok te kopiëren of te splitsen
+    start = 0
+    while start < len(text):
+        end = text.find(separator, start)
+        if end == -1:
+            end = len(text)
+        record = text[start:end].strip()
+        if record:
+            yield record
+        start = end + 1
+
+
+def decode_cpt_values(values, columns=BRO_CPT_COLUMNS, dtype=float):
+    # zet het values blok van een BRO CPT direct om in een array met floats
+    # regels eindigen op ; en waarden worden gescheiden door ,
+    # alleen de gevraagde kolommen worden ingelezen
+    usecols = [BRO_CPT_COLUMNS.index(column) for column in columns]
+    array = np.loadtxt(
+        split_records(values),
+        delimiter=",",
+        usecols=usecols,
+        ndmin=2,
+        comments=None,
+        dtype=dtype,
+    )
+
+    # lege waarden direct omzetten in nan, zonder kopie
+    array[array == BRO_VOID] = np.nan
+    return array
+
+
+@lru_cache(maxsize=None)
+def local_name(tag):
+    # tag zonder namespace, {http://www.broservices.nl/...}broId wordt broId
+    return tag.rpartition("}")[2]
+
+
+def element_texts(element, whitespace=r"\n\s*"):
+    # alle teksten in een element, met de tag zonder namespace als sleutel
+    return {
+        local_name(p.tag): re.sub(whitespace, "", p.text)
+        for p in element.iter()
+        if p.text is not None
+    }
+
+
+class XmlDispatcher:
+    # leest een BRO XML in stukken en roept per element een functie aan
+    # de functie hoort bij de naam van het element zonder namespace
+    # een element wordt afgehandeld zodra het compleet is en daarna opgeruimd,
+    # zo blijft niet de hele XML in het geheugen
+    def __init__(self, handlers):
+        self.handlers = handlers
+        # volledige tag met namespace -> functie, wordt tijdens het lezen gevuld
+        self.resolved = {}
+
+    def handler(self, tag):
+        try:
+            return self.resolved[tag]
+        except KeyError:
+            handler = self.resolved[tag] = self.handlers.get(local_name(tag))
+            return handler
+
+    def parse(self, test, xmlFile, stop=()):
+        # de inhoud van een element met een functie is nodig tot het element compleet is
+        # bij het begin van een element in stop wordt niet verder gelezen,
+        # de naam van dat element wordt teruggegeven
+        keep = 0
+        # de open elementen, het laatste is de ouder van het element dat compleet wordt
+        parents = []
+        for event, element in iterparse(xmlFile, events=("start", "end")):
+            handler = self.handler(element.tag)
+            if event == "start":
+                if stop and local_name(element.tag) in stop:
+                    return local_name(element.tag)
+                if handler is not None:
+                    keep += 1
+                parents.append(element)
+                continue
+
+            parents.pop()
+            if handler is not None:
+                handler(test, element)
+                keep -= 1
+            if keep == 0:
+                element.clear()
+                # ook uit de ouder halen, anders blijft per laag of meting een leeg element staan
+                # de eerdere kinderen zijn al weg, dus het element staat vooraan
+                if parents:
+                    parents[-1].remove(element)
+
+
+def xml_testid(test, element):
+    test.testid = element.text
+
+
+def xml_location(test, element):
+    location = element_texts(element)
+    test.easting = float(location["pos"].split()[0])
+    test.northing = float(location["pos"].split()[1])
+
+
+def xml_vertical_position(test, element):
+    verticalPosition = element_texts(element)
+    test.groundlevel = float(verticalPosition["offset"])
+
+
+def xml_finaldepth(test, element):
+    test.finaldepth = float(element.text)
+
+
+def xml_report_date(test, element):
+    date = element_texts(element)
+    try:  # een datum is niet verplicht
+        test.date = datetime.strptime(date["date"], "%Y-%m-%d")
+    except:
+        pass
+
+
+def xml_cpt_values(test, element):
+    # er kan een dissipatietest inzitten, die staat in dissipationTest
+    # hiermee wordt alleen de cpt ingelezen
+    for child in element.iter():
+        if local_name(child.tag) == "values":
+            test.data = child.text
+
+
+def xml_removed_layer(test, element):
+    # TODO: maak hier van een Bore() en plot die ook
+    test.removedlayers = element_texts(element)
+
+
+def xml_borehole_log(test, element):
+    for child in element.iter():
+        tag = local_name(child.tag)
+        if tag == "descriptionQuality":
+            test.descriptionquality = child.text
+        elif tag == "descriptionLocation":
+            descriptionLocation = child.text
+            soillayers = []
+        elif tag == "layer":
+            # TODO: onderscheid maken tussen veld en labbeschrijving
+            soillayers.append(element_texts(child, r"\s*"))
+    # zet soillayers om in dataframe om het makkelijker te verwerken
+    test.soillayers[descriptionLocation] = pd.DataFrame(soillayers)
+
+
+def xml_borehole_analysis(test, element):
+    for child in element.iter():
+        if local_name(child.tag) == "investigatedInterval":
+            test.analyses.append(element_texts(child, r"\s*"))
+
+
+# functies per element voor de BRO objecten
+# voor een nieuw type (bijvoorbeeld BHR-P of BHR-G) is een nieuwe tabel genoeg
+CPT_XML = XmlDispatcher(
+    {
+        "broId": xml_testid,
+        "deliveredLocation": xml_location,
+        "deliveredVerticalPosition": xml_vertical_position,
+        "finalDepth": xml_finaldepth,
+        "researchReportDate": xml_report_date,
+        "conePenetrationTest": xml_cpt_values,
+        "removedLayer": xml_removed_layer,
+    }
+)
+BHR_XML = XmlDispatcher(
+    {
+        # TODO: er zijn ook boringen zonder broId, met requestReference dat toevoegen levert een vreemde waarde voor testid
+        "broId": xml_testid,
+        "requestReference": xml_testid,
+        "deliveredLocation": xml_location,
+        "deliveredVerticalPosition": xml_vertical_position,
+        "finalDepthBoring": xml_finaldepth,
+        "descriptionReportDate": xml_report_date,
+        "descriptiveBoreholeLog": xml_borehole_log,
+        "boreholeSampleAnalysis": xml_borehole_analysis,
+    }
+)
+
+# alleen de data, voor het later inlezen van een sondering of boring waarvan de metadata al gelezen is
+# de metadata staat in de XML voor deze elementen, daar kan het lezen van de metadata stoppen
+CPT_XML_DATA = XmlDispatcher(
+    {
+        "conePenetrationTest": xml_cpt_values,
+        "removedLayer": xml_removed_layer,
+    }
+)
+BHR_XML_DATA = XmlDispatcher(
+    {
+        "descriptiveBoreholeLog": xml_borehole_log,
+        "boreholeSampleAnalysis": xml_borehole_analysis,
+    }
+)
+
+
+def optional_text_column(df, column):
+    # niet elke boring heeft alle kolommen
+    # ontbrekende kolommen en waarden worden een lege string
+    if column not in df.columns:
+        return np.full(len(df), "", dtype=object)
+    values = df[column].to_numpy(dtype=object)
+    values[pd.isna(values)] = ""
+    return values
+
+
+def write_gef_batch(tests, target):
+    # schrijf meerdere sonderingen of boringen naar een open bestand of zip archief
+    # in een archief krijgt elke test een eigen bestand,
+    # in een open bestand komen ze achter elkaar
+    if isinstance(target, zipfile.ZipFile):
+        for test in tests:
+            with target.open(f"{test.testid}.gef", "w") as member:
+                with TextIOWrapper(member) as f:
+                    test.write_gef(f)
+    else:
+        for test in tests:
+            test.write_gef(target)
+
+
+# volgorde waarin een GEF zonder opgegeven encoding gedecodeerd wordt
+GEF_ENCODINGS = ("utf-8", "cp1252", "latin-1")
+
+
+@dataclass
+class GefHeader:
+    # ruwe waarden per keyword uit de header van een GEF, in de volgorde van het bestand
+    keywords: Dict[str, List[str]] = field(default_factory=dict)
+    # positie in bytes van de eerste regel na #EOH
+    data_offset: int = 0
+
+    def first(self, keyword, default=None):
+        # waarde van het eerste voorkomen van een keyword
+        values = self.keywords.get(keyword)
+        return values[0] if values else default
+
+    def all(self, keyword):
+        # waarden van alle keren dat een keyword voorkomt, bijvoorbeeld COLUMNINFO
+        return self.keywords.get(keyword, [])
+
+    def fields(self, keyword):
+        # velden van het eerste voorkomen van een keyword
+        value = self.first(keyword)
+        return [] if value is None else split_fields(value)
+
+    def measurementtext(self, label, default=None):
+        # tekst uit een MEASUREMENTTEXT met een bepaalde omschrijving
+        # bijvoorbeeld #MEASUREMENTTEXT= 6, Project Zuid, projectnaam
+        for value in self.all("MEASUREMENTTEXT"):
+            fields = split_fields(value)
+            if len(fields) >= 3 and fields[-1] == label:
+                return ", ".join(fields[1:-1])
+        return default
+
+
+def split_fields(value):
+    return [part.strip() for part in value.split(",")]
+
+
+def parse_gef_header(lines):
+    # lees de header van een GEF regel voor regel tot en met #EOH
+    # elk keyword wordt één keer bekeken
+    header = GefHeader()
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("#"):
+            continue
+        keyword, _, value = line[1:].partition("=")
+        keyword = keyword.strip().upper()
+        if keyword == "EOH":
+            break
+        header.keywords.setdefault(keyword, []).append(value.strip())
+    return header
+
+
+def decode_gef_text(raw, encoding=None):
+    # nieuwere GEF bestanden zijn utf-8, oudere vaak cp1252
+    # latin-1 kan altijd gedecodeerd worden en is de laatste mogelijkheid
+    if encoding is not None:
+        return raw.decode(encoding), encoding
+    for encoding in GEF_ENCODINGS:
+        try:
+            return raw.decode(encoding), encoding
+        except UnicodeDecodeError:
+            pass
+
+
+class GefFile:
+    # een GEF bestand als memory map
+    # de header wordt direct gelezen, de data pas als daarom gevraagd wordt
+    def __init__(self, gefFile, encoding=None):
+        self.path = gefFile
+        with open(gefFile, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # de data begint op de regel na #EOH
+        eoh = self.mm.find(b"#EOH")
+        eol = self.mm.find(b"\n", eoh) if eoh != -1 else -1
+        data_offset = len(self.mm) if eol == -1 else eol + 1
+
+        header_text, self.encoding = decode_gef_text(self.mm[:data_offset], encoding)
+        self.header = parse_gef_header(header_text.splitlines())
+        self.header.data_offset = data_offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.mm.close()
+
+    def data_text(self):
+        return self.mm[self.header.data_offset :].decode(self.encoding)
+
+    def data_array(self, columnseparator=" ", recordseparator="", columnvoids={}):
+        # lees de numerieke data direct uit de memory map, regel voor regel
+        # geeft een ValueError als de data geen tabel met getallen is
+        # en een TypeError als het scheidingsteken uit meer dan één teken bestaat
+        delimiter = columnseparator if columnseparator.strip() else None
+
+        # met een vast aantal kolommen mag een regel eindigen op het scheidingsteken
+        try:
+            usecols = range(int(self.header.fields("COLUMN")[0]))
+        except (IndexError, ValueError):
+            usecols = None
+
+        # alles na het recordscheidingsteken wordt overgeslagen
+        self.mm.seek(self.header.data_offset)
+        array = np.loadtxt(
+            iter(self.mm.readline, b""),
+            delimiter=delimiter,
+            usecols=usecols,
+            comments=recordseparator or None,
+            ndmin=2,
+            encoding=self.encoding,
+        )
+
+        # vervang de dummy waarden door nan
+        for columnnr, voidvalue in columnvoids.items():
+            if columnnr < array.shape[1]:
+                column = array[:, columnnr]
+                column[column == voidvalue] = np.nan
+        return array
+
+
+def set_gef_metadata(test, header):
+    # metadata die voor sonderingen en boringen hetzelfde in de header staat
+    test.testid = header.first("TESTID", test.testid)
+
+    xyid = header.fields("XYID")
+    try:
+        test.srid = xyid[0]
+        test.easting = float(xyid[1])
+        test.northing = float(xyid[2])
+    except (IndexError, ValueError):
+        pass
+
+    # check oude RD-coördinaten
+    if test.easting is not None and test.easting < 0:
+        tf = Transformer.from_crs(28991, 28892)
+        x, y = tf.transform(test.easting, test.northing)
+        test.easting = x
+        test.northing = y
+
+    try:
+        test.groundlevel = float(header.fields("ZID")[1])
+    except (IndexError, ValueError):
+        pass
+
+    # de naam van het bedrijf kan komma's bevatten, de laatste twee velden niet
+    companyid = header.first("COMPANYID")
+    if companyid is not None and companyid.count(",") >= 2:
+        test.companyid = companyid.rsplit(",", 2)[0].strip()
+    test.companyid = header.measurementtext("boorbedrijf", test.companyid)
+
+    projectid = header.fields("PROJECTID")
+    if projectid:
+        test.projectid = projectid[0]
+    test.projectname = header.first("PROJECTNAME", test.projectname)
+    test.projectname = header.measurementtext("projectnaam", test.projectname)
+
+    test.columnseparator = header.first("COLUMNSEPARATOR") or test.columnseparator
+    test.recordseparator = header.first("RECORDSEPARATOR") or test.recordseparator
+
+    for columnvoid in header.all("COLUMNVOID"):
+        try:
+            columnnr, voidvalue = split_fields(columnvoid)[:2]
+            test.columnvoid_values[int(columnnr) - 1] = float(voidvalue)
+        except ValueError:
+            pass
+
+
+def gef_finaldepth(gef, test, quantities):
+    # de einddiepte staat niet in de header, wel in de laatste regel van de data
+    # alleen het einde van het bestand wordt gelezen
+    # quantities: nummers van de grootheden die de diepte kunnen bevatten, de eerste die er is telt
+    columnnrs = {}
+    for columninfo in gef.header.all("COLUMNINFO"):
+        fields = split_fields(columninfo)
+        try:
+            columnnrs[fields[-1]] = int(fields[0]) - 1
+        except ValueError:
+            pass
+    columnnr = next(
+        (columnnrs[quantity] for quantity in quantities if quantity in columnnrs), None
+    )
+    if columnnr is None:
+        return None
+
+    tail = gef.mm[max(gef.header.data_offset, len(gef.mm) - 4096) :]
+    lines = [
+        line
+        for line in tail.decode(gef.encoding, errors="replace").splitlines()
+        if line.strip()
+    ]
+    if not lines:
+        return None
+    record = lines[-1]
+    if test.recordseparator:
+        record = record.split(test.recordseparator)[0]
+    separator = test.columnseparator if test.columnseparator.strip() else None
+    try:
+        value = float(record.split(separator)[columnnr])
+    except (IndexError, ValueError):
+        return None
+    if value == test.columnvoid_values.get(columnnr):
+        return None
+    return abs(value)
 
 
 @dataclass
+class SoilLines:
+    # grondsoortgrenzen als rechte lijnen y = intercept + slope * x in volgorde van de grondsoorten
+    # een punt krijgt de eerste grondsoort waarvan de lijn boven het punt ligt
+    labels: List[str]
+    slopes: np.ndarray
+    intercepts: np.ndarray
+
+    @classmethod
+    def from_points(cls, lines):
+        # lijnen opgegeven als twee punten [[x1, y1], [x2, y2]] per grondsoort
+        points = np.array(list(lines.values()), dtype=float)
+        slopes = (points[:, 1, 1] - points[:, 0, 1]) / (
+            points[:, 1, 0] - points[:, 0, 0]
+        )
+        intercepts = points[:, 0, 1] - slopes * points[:, 0, 0]
+        return cls(list(lines.keys()), slopes, intercepts)
+
+    def classify(self, x, y):
+        # geeft per punt het nummer van de grondsoort, -1 als het punt boven alle lijnen ligt
+        # punten met nan krijgen ook -1
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+
+        # lijn voor lijn, alleen voor punten die nog geen grondsoort hebben
+        # per lijn één vergelijking over alle punten, het geheugen groeit alleen met het aantal punten
+        codes = np.full(len(x), -1, dtype=np.int8)
+        for code, (slope, intercept) in enumerate(zip(self.slopes, self.intercepts)):
+            codes[(codes == -1) & (y < intercept + slope * x)] = code
+        return codes
+
+
+@dataclass
+class SoilThresholds:
+    # grondsoortgrenzen als aflopende grenswaarden van één grootheid
+    # een punt krijgt de eerste grondsoort waarvan de grenswaarde kleiner is dan de waarde
+    labels: List[str]
+    thresholds: np.ndarray
+
+    def classify(self, values):
+        # geeft per punt het nummer van de grondsoort, -1 als de waarde niet boven een grens ligt
+        # punten met nan krijgen ook -1
+        values = np.asarray(values, dtype=float)
+        codes = np.searchsorted(-self.thresholds, -values, side="right")
+        codes[codes == len(self.labels)] = -1
+        return codes.astype(np.int8)
+
+
+def label_codes(codes, dtype):
+    # grondsoortnamen bij de nummers als categorical, -1 wordt nan
+    # de nummers worden niet omgezet in strings, de namen staan één keer in het dtype
+    return pd.Categorical.from_codes(codes, dtype=dtype)
+
+
+# DFoundations 3 type rule [frictionRatio, coneResistance] waarden voor lijn die bovengrens vormt
+# TODO: resultaat komt niet overeen met DFoundations
+THREE_TYPE_LINES = SoilLines.from_points(
+    OrderedDict(
+        [
+            ["veen", [[0.0, np.log10(0.00002)], [10, np.log10(0.2)]]],
+            ["klei", [[0.0, np.log10(0.01)], [10, np.log10(100)]]],
+            ["zand", [[0.0, np.log10(0.5)], [10, np.log10(5000)]]],
+        ]
+    )
+)
+
+# DFoundations NEN rule [frictionRatio, coneResistance]
+# TODO: resultaat komt niet overeen met DFoundations
+NEN_LINES = SoilLines.from_points(
+    OrderedDict(
+        [
+            # ['veen', [[0, np.log10(0)], [10, np.log10(0.08)]]], # slappe consistentie, past niet in schema
+            [
+                "veen",
+                [[0, np.log10(0.000058)], [10, np.log10(0.58)]],
+            ],  # coneResistance van het eerste punt aangepast
+            # ['humeuzeKlei', [[0, np.log10(0.004)], [10, np.log10(39.59)]]], # slappe consistentie, past niet in schema
+            ["humeuzeKlei", [[0, np.log10(0.02)], [10, np.log10(201)]]],
+            ["klei", [[0, np.log10(0.068)], [10, np.log10(676.1)]]],
+            ["zwakZandigeKlei", [[0, np.log10(0.292)], [10, np.log10(2921)]]],
+            ["sterkZandigeKlei", [[0, np.log10(0.516)], [10, np.log10(5165)]]],
+            ["zwakZandigSilt", [[0, np.log10(1.124)], [10, np.log10(11240)]]],
+            ["sterkZandigSilt", [[0, np.log10(2.498)], [10, np.log10(24980)]]],
+            ["sterkSiltigZand", [[0, np.log10(4.606)], [10, np.log10(46060)]]],
+            ["zwakSiltigZand", [[0, np.log10(8.594)], [10, np.log10(85940)]]],
+            ["zand", [[0, np.log10(13.11)], [10, np.log10(131100)]]],
+            ["grind", [[0, np.log10(24.92)], [10, np.log10(249200)]]],
+        ]
+    )
+)
+
+# DFoundations qc only rule
+QC_ONLY = SoilThresholds(["zand", "klei", "veen"], np.array([4, 1, 0.1]))
+
+# formula from: Soil Behaviour Type from the CPT: an update
+# http://www.cpt-robertson.com/PublicationsPDF/2-56%20RobSBT.pdf
+# non-normalized soil behaviour types omgezet naar Nederlandse namen
+ROBERTSON = SoilThresholds(
+    ["veen", "klei", "zwakKleiigSilt", "zwakSiltigZand", "sterkSiltigZand", "zand"],
+    np.array([3.6, 2.95, 2.6, 2.05, 1.31, 0]),
+)
+
+CUSTOM_LABELS = ["zand", "veen", "klei"]
+
+
+def robertson_index(qc, rf):
+    # formule voor non-normalized soil behaviour type
+    return ((3.47 - np.log10(qc * 1000 / 100)) ** 2 + (np.log10(rf + 1.22)) ** 2) ** 0.5
+
+
+def custom_codes(rf):
+    # zand en veen op basis van het wrijvingsgetal, de rest is klei
+    return np.select([rf <= 1.2, rf >= 4.8], [0, 1], 2).astype(np.int8)
+
+
+# grondsoortnamen per interpretatie, in de volgorde waarin de kolommen toegevoegd worden
+# alle sonderingen delen per interpretatie hetzelfde categorical dtype
+INTERPRETATION_DTYPES = {
+    "qcOnly": pd.CategoricalDtype(QC_ONLY.labels),
+    "threeType": pd.CategoricalDtype(THREE_TYPE_LINES.labels),
+    "NEN": pd.CategoricalDtype(NEN_LINES.labels),
+    "Robertson": pd.CategoricalDtype(ROBERTSON.labels),
+    "customInterpretation": pd.CategoricalDtype(CUSTOM_LABELS),
+}
+
+
+def interpret_values(qc, rf):
+    # alle interpretaties voor reeksen conusweerstand en wrijvingsgetal
+    # geeft log(qc) en per interpretatie de nummers van de grondsoorten
+    qc = np.asarray(qc, dtype=float)
+    rf = np.asarray(rf, dtype=float)
+    # de threeType en NEN regels gelden voor log(qc)
+    logqc = np.log(qc)
+    codes = {
+        "qcOnly": QC_ONLY.classify(qc),
+        "threeType": THREE_TYPE_LINES.classify(rf, logqc),
+        "NEN": NEN_LINES.classify(rf, logqc),
+        "Robertson": ROBERTSON.classify(robertson_index(qc, rf)),
+        "customInterpretation": custom_codes(rf),
+    }
+    return logqc, codes
+
+
+def interpret_many(cpts):
+    # interpreteer veel sonderingen in één keer
+    # de metingen worden achter elkaar gezet en in één keer ingedeeld,
+    # daarna krijgt elke sondering zijn eigen deel van de resultaten
+    # geeft de grenzen tussen de sonderingen en de nummers van de grondsoorten
+    lengths = [len(cpt.data) for cpt in cpts]
+    offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+    if len(cpts) == 0:
+        return offsets, {}
+
+    qc = np.concatenate(
+        [cpt.data["coneResistance"].to_numpy(dtype=float) for cpt in cpts]
+    )
+    rf = np.concatenate(
+        [cpt.data["frictionRatio"].to_numpy(dtype=float) for cpt in cpts]
+    )
+    logqc, codes = interpret_values(qc, rf)
+
+    labelled = {
+        column: label_codes(codes[column], dtype)
+        for column, dtype in INTERPRETATION_DTYPES.items()
+    }
+    for cpt, start, stop in zip(cpts, offsets[:-1], offsets[1:]):
+        cpt.data["logConeResistance"] = logqc[start:stop]
+        for column, values in labelled.items():
+            cpt.data[column] = values[start:stop]
+    return offsets, codes
+
+
+# manieren om metingen op een vast grid van diepten of niveaus te zetten
+# bij de andere methoden wordt elk grid punt het midden van een vak tot halverwege de buurpunten
+RESAMPLE_METHODS = ("mean", "median", "min", "max", "interpolate")
+
+
+def grid_edges(grid):
+    # grenzen van de vakken rond de punten van een oplopend grid
+    # alleen nodig om te middelen e.d., interpoleren kan ook op één punt
+    if len(grid) < 2:
+        raise ValueError("een grid heeft minstens twee punten nodig om te middelen")
+    middles = (grid[1:] + grid[:-1]) / 2
+    return np.concatenate(
+        [
+            [grid[0] - (grid[1] - grid[0]) / 2],
+            middles,
+            [grid[-1] + (grid[-1] - grid[-2]) / 2],
+        ]
+    )
+
+
+def resample_values(positions, values, grid, method="mean", groups=None, ngroups=1):
+    # zet metingen van een of meer sonderingen op een grid
+    # groups geeft per meting het nummer van de sondering, het resultaat heeft een regel per
+    # sondering en een kolom per grid punt, punten zonder metingen zijn nan
+    if method not in RESAMPLE_METHODS:
+        raise ValueError(f"onbekende methode {method}, kies uit {RESAMPLE_METHODS}")
+    grid = np.asarray(grid, dtype=float)
+    # een grid van niveaus loopt meestal af, reken met een oplopend grid
+    descending = len(grid) > 1 and grid[0] > grid[-1]
+    if descending:
+        grid = grid[::-1]
+
+    positions = np.asarray(positions, dtype=float)
+    values = np.asarray(values, dtype=float)
+    groups = np.zeros(len(values), dtype=np.int64) if groups is None else groups
+    keep = ~np.isnan(positions) & ~np.isnan(values)
+    positions, values, groups = positions[keep], values[keep], groups[keep]
+
+    result = np.full((ngroups, len(grid)), np.nan)
+    if method == "interpolate":
+        for group in np.unique(groups):
+            selected = groups == group
+            order = np.argsort(positions[selected], kind="stable")
+            result[group] = np.interp(
+                grid,
+                positions[selected][order],
+                values[selected][order],
+                left=np.nan,
+                right=np.nan,
+            )
+    else:
+        bins = np.searchsorted(grid_edges(grid), positions, side="right") - 1
+        inside = (bins >= 0) & (bins < len(grid))
+        keys = groups[inside] * len(grid) + bins[inside]
+        values = values[inside]
+        # sorteer op vak, voor de mediaan ook op waarde binnen het vak
+        if method == "median":
+            order = np.lexsort((values, keys))
+        else:
+            order = np.argsort(keys, kind="stable")
+        keys, values = keys[order], values[order]
+        cells, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        if len(cells):
+            if method == "mean":
+                aggregated = np.add.reduceat(values, starts) / counts
+            elif method == "min":
+                aggregated = np.minimum.reduceat(values, starts)
+            elif method == "max":
+                aggregated = np.maximum.reduceat(values, starts)
+            else:
+                aggregated = (
+                    values[starts + (counts - 1) // 2] + values[starts + counts // 2]
+                ) / 2
+            result.reshape(-1)[cells] = aggregated
+
+    if descending:
+        result = result[:, ::-1]
+    return result
+
+
+def resample_positions(cpt, reference="depth"):
+    # diepte t.o.v. maaiveld of niveau t.o.v. NAP van de metingen
+    depth = cpt.measurement("depth")
+    if reference == "depth":
+        return depth
+    if reference == "nap":
+        groundlevel = 0 if cpt.groundlevel is None else cpt.groundlevel
+        return groundlevel - depth
+    raise ValueError(f"onbekende referentie {reference}, kies uit depth of nap")
+
+
+def resample_many(
+    cpts, grid, column="coneResistance", method="mean", reference="depth"
+):
+    # zet een kolom van veel sonderingen in één keer op hetzelfde grid
+    # geeft een array met een regel per sondering en een kolom per grid punt
+    lengths = [len(cpt.data) for cpt in cpts]
+    if len(cpts) == 0:
+        return np.empty((0, len(grid)))
+    return resample_values(
+        np.concatenate([resample_positions(cpt, reference) for cpt in cpts]),
+        np.concatenate([cpt.measurement(column) for cpt in cpts]),
+        grid,
+        method,
+        np.repeat(np.arange(len(cpts)), lengths),
+        len(cpts),
+    )
+
+
+# kolommen die een eigen as in de figuur van een sondering krijgen
+CPT_PLOT_POREPRESSURES = ("porePressureU1", "porePressureU2", "porePressureU3")
+CPT_PLOT_INCLINATIONS = (
+    "inclinationEW",
+    "inclinationNS",
+    "inclinationX",
+    "inclinationY",
+    "inclinationResultant",
+)
+# teksten in het stempel
+CPT_PLOT_LOCATION = "Sondering: {testid}\nx-coördinaat: {easting}\ny-coördinaat: {northing}\nmaaiveld: {groundlevel}\n"
+CPT_PLOT_PROJECT = "Uitvoerder: {companyid}\nDatum: {date}\nProjectnummer: {projectid}\nProjectnaam: {projectname}"
+# y-as [m t.o.v. NAP] waarmee de marges van een template berekend worden
+CPT_PLOT_TEMPLATE_YLIM = (-60, 5)
+CPT_PLOT_COLORS = {
+    "qc": "red",
+    "fs": "blue",
+    "Rf": "green",
+    "inclination": "grey",
+    "porepressure": "black",
+}
+
+
+def decimate_minmax(x, y, rows):
+    # verdeel y in rows vakken (pixelrijen) en houd van elke reeks opeenvolgende punten
+    # in hetzelfde vak alleen het eerste, laatste, kleinste en grootste punt over
+    # de lijn ziet er dan hetzelfde uit, met pieken, maar bij een sondering met oplopende
+    # diepte zijn het hooguit 4 punten per rij
+    # punten zonder waarde blijven staan zodat de lijn op dezelfde plekken onderbroken is
+    if len(x) <= 4 * rows:
+        return x, y
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    if not valid.any():
+        return x, y
+    indices = np.flatnonzero(valid)
+    values = x[valid]
+    low, high = y[valid].min(), y[valid].max()
+    if high == low:
+        bins = np.zeros(len(indices), dtype=np.int64)
+    else:
+        bins = np.minimum(
+            ((y[valid] - low) / (high - low) * rows).astype(np.int64), rows - 1
+        )
+
+    starts = np.flatnonzero(np.diff(bins, prepend=-1))
+    lengths = np.diff(np.append(starts, len(bins)))
+    ends = starts + lengths - 1
+    runs = np.repeat(np.arange(len(starts)), lengths)
+    keep = [np.flatnonzero(~valid), indices[starts], indices[ends]]
+    for extreme in (np.minimum, np.maximum):
+        # het eerste punt met de kleinste of grootste waarde van elke reeks
+        candidates = np.flatnonzero(values == extreme.reduceat(values, starts)[runs])
+        first = np.diff(runs[candidates], prepend=-1) != 0
+        keep.append(indices[candidates[first]])
+    keep = np.unique(np.concatenate(keep))
+    return x[keep], y[keep]
+
+
+class CptPlotTemplate:
+    # figuur van een sondering die voor meerdere sonderingen gebruikt kan worden
+    # de assen, labels, legenda's en het stempel worden één keer gemaakt,
+    # per sondering worden alleen de lijnen, de y-as en de teksten aangepast
+    def __init__(self, porepressures=(), inclinations=()):
+        colors = CPT_PLOT_COLORS
+
+        # figuur met conusweerstand, wrijving, wrijvingsgetal, helling en waterspanning
+        # TODO: dit kunnen we ook op dezelfde manier doen als bij de boringen, zodat de verticale schaal altijd hetzelfde is
+        # TODO: dat is wel lastiger met pdf maken
+        fig = Figure(figsize=(8.3 * 2, 11.7 * 2))  # 8.3 x 11.7 inch is een A4
+        FigureCanvasAgg(fig)
+        gs = GridSpec(2, 1, height_ratios=[10, 1], figure=fig)
+
+        ax = fig.add_subplot(gs[0, 0])
+        axes = [ax, ax.twiny(), ax.twiny()]
+
+        # Rf plot vanaf rechts
+        axes[2].invert_xaxis()
+
+        # lijnen per kolom, de data wordt per sondering ingevuld
+        self.lines = {}
+        for porePressure in porepressures:
+            axes.append(ax.twiny())
+            self.lines[porePressure] = axes[-1].plot(
+                [],
+                [],
+                label=porePressure[-2:],
+                linewidth=1.25,
+                color=colors["porepressure"],
+                linestyle="-.",
+            )[0]
+            axes[-1].set_xlabel("u [Mpa]", loc="left")
+            axes[-1].set_xlim([-1, 1])
+            axes[-1].spines["top"].set_position(("axes", 1.02))
+            axes[-1].spines["top"].set_bounds(0, 1)
+            axes[-1].xaxis.label.set_color(colors["porepressure"])
+            axes[-1].set_xticks([0, 0.25, 0.5, 0.75, 1.0])
+            axes[-1].legend()
+
+        # maak een plot met helling, aan de rechterkant
+        if inclinations:
+            axes.append(ax.twiny())
+            axes[-1].invert_xaxis()
+            axes[-1].set_xlim([40, 0])
+            axes[-1].spines["top"].set_position(("axes", 1.02))
+            axes[-1].spines["top"].set_bounds(10, 0)
+            axes[-1].set_xlabel("helling [deg]", loc="right")
+            axes[-1].xaxis.label.set_color(colors["inclination"])
+            axes[-1].set_xticks([0, 2, 4, 6, 8, 10])
+        for inclination in inclinations:
+            self.lines[inclination] = axes[-1].plot(
+                [],
+                [],
+                label=re.sub(r"inclination", "", inclination),
+                linewidth=1.25,
+                color=colors["inclination"],
+            )[0]
+        if inclinations:
+            axes[-1].legend()
+
+        # plot data
+        self.lines["coneResistance"] = axes[0].plot(
+            [], [], label="qc [MPa]", linewidth=1.25, color=colors["qc"]
+        )[0]
+        self.lines["localFriction"] = axes[1].plot(
+            [],
+            [],
+            label="fs [MPa]",
+            linewidth=1.25,
+            color=colors["fs"],
+            linestyle="--",
+        )[0]
+        self.lines["frictionRatio"] = axes[2].plot(
+            [], [], label="Rf [%]", linewidth=1.25, color=colors["Rf"]
+        )[0]
+
+        # plot maaiveld, bestaat uit een streep en een arcering
+        (self.maaiveld,) = axes[0].plot([0, 10], [0, 0], color="black")
+        (self.arcering,) = axes[0].barh(
+            0,
+            width=10,
+            height=-0.4,
+            align="edge",
+            hatch="/\\/",
+            color="#ffffffff",
+        )
+
+        # stel de teksten in voor de labels
+        axes[0].set_ylabel("Niveau [m t.o.v. NAP]")
+        axes[0].set_xlabel("qc [MPa]")
+        axes[1].set_xlabel("fs [MPa]", loc="left")
+        axes[2].set_xlabel("Rf [%]", loc="right")
+
+        # verplaats de x-assen zodat ze niet overlappen
+        axes[1].spines["top"].set_bounds(0, 1)
+        axes[2].spines["top"].set_bounds(15, 0)
+
+        # kleur de labels van de x-assen hetzelfde als de data
+        axes[0].xaxis.label.set_color(colors["qc"])
+        axes[1].xaxis.label.set_color(colors["fs"])
+        axes[2].xaxis.label.set_color(colors["Rf"])
+
+        # stel de min en max waarden van de assen in
+        axes[0].set_xlim([0, 40])  # conusweerstand
+        axes[1].set_xlim([0, 2])  # plaatselijke wrijving
+        axes[2].set_xlim([40, 0])  # wrijvingsgetal
+
+        axes[1].set_xticks([0, 0.5, 1.0])
+        axes[2].set_xticks([0, 2, 4, 6, 8, 10, 12])
+
+        # metadata in plot
+        stempel = fig.add_subplot(gs[1, 0])
+        stempel.set_axis_off()
+        # de teksten hebben hetzelfde aantal regels als bij een sondering, voor de marges
+        self.locatie = stempel.text(
+            0.05,
+            0.6,
+            CPT_PLOT_LOCATION.format_map(defaultdict(str)),
+            ha="left",
+            va="top",
+            fontsize=14,
+            fontweight="bold",
+        )
+        self.project = stempel.text(
+            0.35,
+            0.6,
+            CPT_PLOT_PROJECT.format_map(defaultdict(str)),
+            ha="left",
+            va="top",
+            fontsize=14,
+            fontweight="bold",
+        )
+        stempel.text(
+            0.05,
+            0,
+            "Ingenieursbureau Gemeente Amsterdam - Team WGM - Vakgroep Geotechniek",
+            fontsize=13.5,
+        )
+
+        # maak het grid
+        ax.minorticks_on()
+        ax.tick_params(which="major", color="black")
+        ax.tick_params(which="minor", color="black")
+        ax.grid(which="major", linestyle="-", linewidth="0.15", color="black")
+        ax.grid(which="minor", linestyle="-", linewidth="0.1")
+        ax.grid(visible=True, which="both")
+
+        self.fig = fig
+        self.axes = axes
+
+    def render(self, cpt, decimate=False):
+        # met decimate worden alleen de punten getekend die per pixelrij zichtbaar zijn
+        if cpt.groundlevel == None:
+            cpt.groundlevel = 0
+
+        y = cpt.groundlevel - cpt.data["depth"].to_numpy(dtype=float)
+        rows = int(self.fig.get_figheight() * self.fig.dpi)
+        for column, line in self.lines.items():
+            x = cpt.data[column].to_numpy(dtype=float)
+            if decimate:
+                line.set_data(*decimate_minmax(x, y, rows))
+            else:
+                line.set_data(x, y)
+
+        # x,y voor maaiveld in figuur
+        self.maaiveld.set_ydata([cpt.groundlevel, cpt.groundlevel])
+        self.arcering.set_y(cpt.groundlevel)
+
+        # de y-as is gedeeld, eerst de grenzen van alle data, dan de schaal
+        for ax in self.axes:
+            ax.relim()
+        for ax in self.axes:
+            ax.autoscale_view(scalex=False)
+
+        self.locatie.set_text(
+            CPT_PLOT_LOCATION.format(
+                testid=cpt.testid,
+                easting=cpt.easting,
+                northing=cpt.northing,
+                groundlevel=cpt.groundlevel,
+            )
+        )
+        self.project.set_text(
+            CPT_PLOT_PROJECT.format(
+                companyid=cpt.companyid,
+                date=cpt.date,
+                projectid=cpt.projectid,
+                projectname=cpt.projectname,
+            )
+        )
+        return self.fig
+
+    def fix_layout(self, ylim=CPT_PLOT_TEMPLATE_YLIM):
+        # de marges worden één keer berekend met een representatieve y-as,
+        # tight_layout per sondering kost bijna evenveel als een nieuwe figuur
+        self.axes[0].set_ylim(ylim)
+        self.fig.tight_layout()
+        for ax in self.axes:
+            ax.set_autoscaley_on(True)
+
+
+# templates per indeling, elke thread heeft zijn eigen figuren
+CPT_PLOT_TEMPLATES = threading.local()
+
+
+def cpt_plot_template(layout):
+    templates = getattr(CPT_PLOT_TEMPLATES, "templates", None)
+    if templates is None:
+        templates = CPT_PLOT_TEMPLATES.templates = {}
+    if layout not in templates:
+        templates[layout] = CptPlotTemplate(*layout)
+        templates[layout].fix_layout()
+    return templates[layout]
+
+
 class XmlCpt:
+    # vaste attributen in plaats van een __dict__ per sondering
+    __slots__ = (
+        "easting",
+        "northing",
+        "groundlevel",
+        "srid",
+        "testid",
+        "date",
+        "finaldepth",
+        "removedlayers",
+        "_data",
+        "_loader",
+        "filename",
+        "companyid",
+        "projectid",
+        "projectname",
+        "columnvoid_values",
+        "columninfo",
+        "columnseparator",
+        "recordseparator",
+    )
+
     def __init__(self):
         self.easting = None
         self.northing = None
@@ -34,14 +1119,40 @@ class XmlCpt:
         self.date = None
         self.finaldepth = None
         self.removedlayers = {}
-        self.data = None
+        self._data = None
+        # functie die de data inleest als die voor het eerst nodig is
+        self._loader = None
         self.filename = None
         self.companyid = None
         self.projectid = None
         self.projectname = None
 
-    def to_gef_string(self) -> str:
-        has_u2 = self.data["porePressureU2"].notnull().count() > 0
+    @property
+    def data(self):
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            loader(self)
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._loader = None
+        self._data = data
+
+    def measurement(self, name):
+        # kolom als array met floats, een kolom die ontbreekt is nan
+        # bijvoorbeeld een lege kolom die bij compact inlezen niet bewaard is
+        if name in self.data.columns:
+            return self.data[name].to_numpy(dtype=float)
+        return np.full(len(self.data), np.nan)
+
+    def has_u2(self):
+        # count telt ook de lege waarden, dus de u2 kolom wordt geschreven zodra er data is,
+        # lege waarden als void, net als voor compact inlezen zodat de GEF uitvoer gelijk blijft
+        return pd.Series(self.measurement("porePressureU2")).notnull().count() > 0
+
+    def gef_header(self) -> str:
+        has_u2 = self.has_u2()
         s = "#GEFID= 1, 1, 0\n"
         if has_u2:
             s += "COLUMN=6\n"
@@ -80,6 +1191,12 @@ class XmlCpt:
         s += f"#XYID= 28992, {self.easting}, {self.northing}\n"
         s += f"#ZID= 31000, {self.groundlevel}\n"
         s += "#EOH=\n"
+        return s
+
+    def write_gef(self, f):
+        # schrijf de GEF direct naar een open bestand of buffer
+        has_u2 = self.has_u2()
+        f.write(self.gef_header())
 
         # 1 = penetrationLength
         # 2 = coneResistance
@@ -87,141 +1204,75 @@ class XmlCpt:
         # 4 = localFriction
         # 5 = frictionRatio
         # 6 = optioneel porePressureU2
-        for _, row in self.data.iterrows():
-            pl = row["penetrationLength"]
-            qc = row["coneResistance"]
-            de = row["depth"]
-            fs = row["localFriction"]
-            fr = row["frictionRatio"]
-            u2 = row["porePressureU2"]
-
-            if np.isnan(pl):
-                pl = 999
-            if np.isnan(qc):
-                qc = 999
-            if np.isnan(de):
-                de = 999
-            if np.isnan(fs):
-                fs = 999
-            if np.isnan(fr):
-                fr = 999
-            if np.isnan(u2):
-                u2 = 999
-
-            data_line = f"{pl:.3f};{qc:.3f};{de:.3f};{fs:.3f};{fr:.1f}"
-
-            if has_u2:
-                data_line += f";{u2:.3f}"
-
-            s += f"{data_line}\n"
+        columns = GEF_CPT_COLUMNS if has_u2 else GEF_CPT_COLUMNS[:-1]
+        record_format = ";".join(GEF_CPT_FORMATS[: len(columns)]) + "\n"
 
-        return s
+        # vul de lege waarden in één keer per kolom met de void waarde
+        values = [
+            np.where(np.isnan(column), GEF_VOID, column)
+            for column in (self.measurement(name) for name in columns)
+        ]
+        write_records(f, record_format, values)
+
+    def to_gef_string(self) -> str:
+        s = StringIO()
+        self.write_gef(s)
+        return s.getvalue()
 
     def to_gef(self, output_file: str):
-        gef_string = self.to_gef_string()
-        f = open(output_file, "w")
-        f.write(gef_string)
-        f.close()
+        with open(output_file, "w") as f:
+            self.write_gef(f)
 
-    def load_xml(self, xmlFile):
+    def load_xml(self, xmlFile, columns=None, compact=False, dtype=float, lazy=False):
 
         # lees een CPT in vanuit een BRO XML
-        tree = ElementTree()
-        tree.parse(xmlFile)
-        root = tree.getroot()
-
-        for element in root.iter():
-
-            if "broId" in element.tag:
-                self.testid = element.text
-
-            if "deliveredLocation" in element.tag:
-                location = {
-                    re.sub(r"{.*}", "", p.tag): re.sub(r"\n\s*", "", p.text)
-                    for p in element.iter()
-                    if p.text is not None
-                }
-                self.easting = float(location["pos"].split()[0])
-                self.northing = float(location["pos"].split()[1])
-
-            elif "deliveredVerticalPosition" in element.tag:
-                verticalPosition = {
-                    re.sub(r"{.*}", "", p.tag): re.sub(r"\n\s*", "", p.text)
-                    for p in element.iter()
-                    if p.text is not None
-                }
-                self.groundlevel = float(verticalPosition["offset"])
-
-            elif "finalDepth" in element.tag:
-                self.finaldepth = float(element.text)
-
-            elif "researchReportDate" in element.tag:
-                date = {
-                    re.sub(r"{.*}", "", p.tag): re.sub(r"\n\s*", "", p.text)
-                    for p in element.iter()
-                    if p.text is not None
-                }
-                try:  # een datum is niet verplicht
-                    self.date = datetime.strptime(date["date"], "%Y-%m-%d")
-                except:
-                    pass
-
-            # er kan een dissipatietest inzitten, hiermee wordt alleen de cpt ingelezen. Die staat in dissipationTest
-            elif "conePenetrationTest" in element.tag:
-                for child in element.iter():
-                    if "values" in child.tag:
-                        self.data = child.text
-
-            elif "removedLayer" in element.tag:
-                # TODO: maak hier van een Bore() en plot die ook
-                self.removedlayers = {
-                    re.sub(r"{.*}", "", p.tag): re.sub(r"\n\s*", "", p.text)
-                    for p in element.iter()
-                    if p.text is not None
-                }
+        # met columns kan een deel van de kolommen ingelezen worden
+        # met compact worden kolommen zonder waarden niet bewaard
+        # met dtype kunnen de metingen bijvoorbeeld als float32 opgeslagen worden
+        # met lazy wordt alleen de metadata gelezen, de data pas bij het eerste gebruik van data
+        if lazy:
+            CPT_XML.parse(self, xmlFile, stop=CPT_XML_DATA.handlers)
+        else:
+            CPT_XML.parse(self, xmlFile)
 
         filename_pattern = re.compile(r"(.*[\\/])*(?P<filename>.*)\.")
         match = re.search(filename_pattern, xmlFile)
         self.filename = match.group("filename")
 
-        dataColumns = [
-            "penetrationLength",
-            "depth",
-            "elapsedTime",
-            "coneResistance",
-            "correctedConeResistance",
-            "netConeResistance",
-            "magneticFieldStrengthX",
-            "magneticFieldStrengthY",
-            "magneticFieldStrengthZ",
-            "magneticFieldStrengthTotal",
-            "electricalConductivity",
-            "inclinationEW",
-            "inclinationNS",
-            "inclinationX",
-            "inclinationY",
-            "inclinationResultant",
-            "magneticInclination",
-            "magneticDeclination",
-            "localFriction",
-            "poreRatio",
-            "temperature",
-            "porePressureU1",
-            "porePressureU2",
-            "porePressureU3",
-            "frictionRatio",
-        ]
-
-        self.data = pd.read_csv(
-            StringIO(self.data), names=dataColumns, sep=",", lineterminator=";"
-        )
-        self.data = self.data.replace(-999999, np.nan)
+        if lazy:
+            self._loader = partial(
+                XmlCpt.load_xml_data,
+                xmlFile=xmlFile,
+                columns=columns,
+                compact=compact,
+                dtype=dtype,
+            )
+        else:
+            self.decode_xml_values(columns, compact, dtype)
+
+    def load_xml_data(self, xmlFile, columns=None, compact=False, dtype=float):
+        # lees alleen de metingen uit een BRO XML
+        CPT_XML_DATA.parse(self, xmlFile)
+        self.decode_xml_values(columns, compact, dtype)
+
+    def decode_xml_values(self, columns=None, compact=False, dtype=float):
+        # zet het values blok uit de XML om in een dataframe
+        if columns is None:
+            columns = BRO_CPT_COLUMNS
+        values = decode_cpt_values(self.data, columns, dtype)
+        if compact:
+            # magneetveld, geleidbaarheid, temperatuur e.d. zijn meestal helemaal leeg
+            keep = ~np.isnan(values).all(axis=0) | np.isin(columns, BRO_CPT_REQUIRED)
+            columns = [column for column, k in zip(columns, keep) if k]
+            values = values[:, keep]
+        self.data = pd.DataFrame(values, columns=columns)
 
         self.check_depth()
 
         self.data.sort_values(by="depth", inplace=True)
 
-    def load_gef(self, gefFile):
+    def load_gef(self, gefFile, encoding=None, lazy=False):
+        # met lazy wordt alleen de header gelezen, de data pas bij het eerste gebruik van data
         self.columnvoid_values = {}
         self.columninfo = {}
         self.columnseparator = " "
@@ -254,179 +1305,78 @@ class XmlCpt:
         }
 
         filename_pattern = re.compile(r"(.*[\\/])*(?P<filename>.*)\.")
-        gefid_pattern = re.compile(r"#GEFID\s*=\s*(?P<gefid>\d,\d,\d)\s*")
-        xydxdy_id_pattern = re.compile(
-            r"#XYID\s*=\s*(?P<coordsys>\d*)\s*,\s*(?P<X>\d*.?\d*)\s*,\s*(?P<Y>\d*.?\d*)\s*,\s*(?P<dx>\d*.?\d*),\s*(?P<dy>\d*.?\d*)\s*"
-        )
-        xy_id_pattern = re.compile(
-            r"#XYID\s*=\s*(?P<coordsys>\d*)\s*,\s*(?P<X>\d*.?\d*)\s*,\s*(?P<Y>\d*.?\d*)\s*"
-        )
-        z_id_pattern = re.compile(r"#ZID\s*=\s*(?P<datum>\d*)\s*,\s*(?P<Z>.*)\s*")
-        zdz_id_pattern = re.compile(
-            r"#ZID\s*=\s*(?P<datum>\d*)\s*,\s*(?P<Z>.*)\s*,\s*(?P<dZ>.*)\s*"
-        )
-        companyid_pattern = re.compile(
-            r"#COMPANYID\s*=\s*(?P<companyid>.*),\s*\w*,\s*\d*\s*"
-        )
-        projectid_pattern = re.compile(r"#PROJECTID\s*=\s*(?P<projectid>\d*)\s*")
-        projectname_pattern = re.compile(r"#PROJECTNAME\s*=\s*(?P<projectname>.*)\s*")
-        companyid_in_measurementext_pattern = re.compile(
-            r"#MEASUREMENTTEXT\s*=\s*\d*,\s*(?P<companyid>.*),\s*boorbedrijf\s*"
-        )
-        projectname_in_measurementtext_pattern = re.compile(
-            r"#MEASUREMENTTEXT\s*=\s*\d*,\s*(?P<projectname>.*),\s*projectnaam\s*"
-        )
-        startdate_pattern = re.compile(
-            r"#STARTDATE\s*=\s*(?P<startdate>\d*,\s*\d*,\s*\d*)\s*"
-        )
-        testid_pattern = re.compile(r"#TESTID\s*=\s*(?P<testid>.*)\s*")
-
-        data_pattern = re.compile(r"#EOH\s*=\s*(?P<data>(.*\n)*)")
 
-        columnvoid_pattern = re.compile(
-            r"#COLUMNVOID\s*=\s*(?P<columnnr>\d*),\s*(?P<voidvalue>.*)\s*"
-        )
-        columninfo_pattern = re.compile(
-            r"#COLUMNINFO\s*=\s*(?P<columnnr>\d*),\s*(?P<unit>.*),\s*(?P<parameter>.*),\s*(?P<quantitynr>\d*)\s*"
-        )
-        columnseparator_pattern = re.compile(
-            r"#COLUMNSEPARATOR\s*=\s*(?P<columnseparator>.*)"
-        )
-        recordseparator_pattern = re.compile(
-            r"#RECORDSEPARATOR\s*=\s*(?P<recordseparator>.*)"
-        )
-
-        with open(gefFile) as f:
-            gef_raw = f.read()
+        # een al geopend GefFile wordt gebruikt en gesloten, de header is dan al gelezen
+        if isinstance(gefFile, GefFile):
+            gef, gefFile = gefFile, gefFile.path
+        else:
+            gef = GefFile(gefFile, encoding)
+        header = gef.header
 
         try:
             match = re.search(filename_pattern, gefFile)
             self.filename = match.group("filename")
         except:
             pass
-        try:
-            match = re.search(gefid_pattern, gef_raw)
-            self.testid = match.group("gefid")
-        except:
-            pass
-        try:
-            match = re.search(testid_pattern, gef_raw)
-            self.testid = match.group("testid")
-        except:
-            pass
-        try:
-            match = re.search(xydxdy_id_pattern, gef_raw)
-            self.easting = float(match.group("X"))
-            self.northing = float(match.group("Y"))
-            self.srid = match.group("coordsys")
-        except:
-            pass
-        try:
-            match = re.search(xy_id_pattern, gef_raw)
-            self.easting = float(match.group("X"))
-            self.northing = float(match.group("Y"))
-            self.srid = match.group("coordsys")
-        except:
-            pass
 
-        # check oude RD-coördinaten
-        if self.easting < 0:
-            tf = Transformer.from_crs(28991, 28892)
-            x, y = tf.transform(self.easting, self.northing)
-            self.easting = x
-            self.northing = y
-        try:
-            match = re.search(zdz_id_pattern, gef_raw)
-            self.groundlevel = float(match.group("Z"))
-        except:
-            pass
-        try:
-            match = re.search(z_id_pattern, gef_raw)
-            self.groundlevel = float(match.group("Z"))
-        except:
-            pass
-        try:
-            match = re.search(companyid_pattern, gef_raw)
-            self.companyid = match.group("companyid")
-        except:
-            pass
-        try:
-            match = re.search(companyid_in_measurementext_pattern, gef_raw)
-            self.companyid = match.group("companyid")
-        except:
-            pass
-        try:
-            match = re.search(projectid_pattern, gef_raw)
-            self.projectid = match.group("projectid")
-        except:
-            pass
-        try:
-            match = re.search(projectname_pattern, gef_raw)
-            self.projectname = match.group("projectname")
-        except:
-            pass
-        try:
-            match = re.search(projectname_in_measurementtext_pattern, gef_raw)
-            self.projectname = match.group("projectname")
-        except:
-            pass
-        try:
-            match = re.search(startdate_pattern, gef_raw)
-            startdatestring = match.group("startdate")
-            startdatelist = [int(x) for x in startdatestring.split(",")]
-            self.date = date(startdatelist[0], startdatelist[1], startdatelist[2])
-        except:
-            pass
-        try:
-            match = re.search(data_pattern, gef_raw)
-            self.data = match.group("data")
-        except:
-            pass
-        try:
-            match = re.search(columnseparator_pattern, gef_raw)
-            self.columnseparator = match.group("columnseparator")
-        except:
-            pass
+        # de GEFID wordt gebruikt als er geen TESTID is
+        self.testid = header.first("GEFID")
+        set_gef_metadata(self, header)
+
         try:
-            match = re.search(recordseparator_pattern, gef_raw)
-            self.recordseparator = match.group("recordseparator")
-        except:
+            self.date = date(*[int(x) for x in header.fields("STARTDATE")[:3]])
+        except (TypeError, ValueError):
             pass
-        try:
-            matches = re.finditer(columnvoid_pattern, gef_raw)
-            for match in matches:
-                columnnr = match.group("columnnr")
-                voidvalue = match.group("voidvalue")
-                self.columnvoid_values[int(columnnr) - 1] = float(voidvalue)
-        except:
-            pass
-        try:
-            # informatie in kolommen kan meerdere namen hebben
-            # nummers zijn wel gestandardiseerd
-            matches = re.finditer(columninfo_pattern, gef_raw)
-            for match in matches:
-                columnnr = match.group("columnnr")
-                quantitynr = match.group("quantitynr")
+
+        # informatie in kolommen kan meerdere namen hebben
+        # nummers zijn wel gestandardiseerd
+        for columninfo in header.all("COLUMNINFO"):
+            columninfo = split_fields(columninfo)
+            if columninfo[-1] in GEF_COLINFO:
                 # kolomnummers in pandas starten op 0, in gef op 1
-                self.columninfo[int(columnnr) - 1] = GEF_COLINFO[quantitynr]
-        except:
-            pass
+                self.columninfo[int(columninfo[0]) - 1] = GEF_COLINFO[columninfo[-1]]
+
+        if lazy:
+            # voorlopig de diepte van de laatste regel, na het inlezen van de data de grootste diepte
+            self.finaldepth = gef_finaldepth(gef, self, ["11", "1"])
+            gef.close()
+            self._loader = partial(
+                XmlCpt.load_gef_data, gefFile=gefFile, encoding=gef.encoding
+            )
+        else:
+            self.read_gef_data(gef)
 
+    def load_gef_data(self, gefFile, encoding=None):
+        # lees alleen de data uit een GEF waarvan de header al gelezen is
+        self.read_gef_data(GefFile(gefFile, encoding))
+
+    def read_gef_data(self, gef):
         # zet de data om in een dataframe, dan kunnen we er wat mee
         # TODO: read_fwf lijkt beter te werken dan csv voor sommige GEF, maar er zijn er ook met gedeclareerde separators, toch?
         # TODO: maar soms zijn de kolommen niet precies even breed, dan gaat het mis C:/Users/User/PBK/CPT/GEF/002488\002488_S01.GEF
         #        self.data = pd.read_fwf(StringIO(self.data), header=None)
-        self.data = pd.read_csv(
-            StringIO(self.data),
-            sep=self.columnseparator,
-            skipinitialspace=True,
-            lineterminator="\n",
-            header=None,
-        )
+        with gef:
+            try:
+                self.data = pd.DataFrame(
+                    gef.data_array(
+                        self.columnseparator,
+                        self.recordseparator,
+                        self.columnvoid_values,
+                    )
+                )
+            except (ValueError, TypeError):
+                # niet elke GEF is een nette tabel, bijvoorbeeld met lege velden
+                self.data = pd.read_csv(
+                    StringIO(gef.data_text()),
+                    sep=self.columnseparator,
+                    skipinitialspace=True,
+                    lineterminator="\n",
+                    header=None,
+                )
 
-        # vervang de dummy waarden door nan
-        for columnnr, voidvalue in self.columnvoid_values.items():
-            self.data[columnnr] = self.data[columnnr].replace(voidvalue, np.nan)
+                # vervang de dummy waarden door nan
+                for columnnr, voidvalue in self.columnvoid_values.items():
+                    self.data[columnnr] = self.data[columnnr].replace(voidvalue, np.nan)
         # geef de kolommen andere namen
         self.data = self.data.rename(columns=self.columninfo)
 
@@ -465,204 +1415,36 @@ class XmlCpt:
         # gelijk aan finaldepth in xml
         self.finaldepth = self.data["depth"].max()
 
-    def plot(self, path="./output"):
-        if self.groundlevel == None:
-            self.groundlevel = 0
-
-        y = self.groundlevel - self.data["depth"]
-
-        # x,y voor maaiveld in figuur
-        x_maaiveld = [0, 10]
-        y_maaiveld = [self.groundlevel, self.groundlevel]
-
-        # figuur met conusweerstand, wrijving, wrijvingsgetal, helling en waterspanning
-        # TODO: dit kunnen we ook op dezelfde manier doen als bij de boringen, zodat de verticale schaal altijd hetzelfde is
-        # TODO: dat is wel lastiger met pdf maken
-
-        colors = {
-            "qc": "red",
-            "fs": "blue",
-            "Rf": "green",
-            "inclination": "grey",
-            "porepressure": "black",
-        }
-        fig = plt.figure(figsize=(8.3 * 2, 11.7 * 2))  # 8.3 x 11.7 inch is een A4
-        gs = GridSpec(2, 1, height_ratios=[10, 1])
-
-        ax = fig.add_subplot(gs[0, 0])
-        axes = [ax, ax.twiny(), ax.twiny()]
-
-        # Rf plot vanaf rechts
-        axes[2].invert_xaxis()
-
-        porePressures = ["porePressureU1", "porePressureU2", "porePressureU3"]
-        for porePressure in porePressures:
-            if (
-                porePressure in self.data.columns
-                and not self.data[porePressure].isnull().all()
-            ):
-                axes.append(ax.twiny())
-                axes[-1].plot(
-                    self.data[porePressure],
-                    y,
-                    label=porePressure[-2:],
-                    linewidth=1.25,
-                    color=colors["porepressure"],
-                    linestyle="-.",
-                )
-                axes[-1].set_xlabel("u [Mpa]", loc="left")
-                axes[-1].legend()
-                axes[-1].set_xlim([-1, 1])
-                axes[-1].spines["top"].set_position(("axes", 1.02))
-                axes[-1].spines["top"].set_bounds(0, 1)
-                axes[-1].xaxis.label.set_color(colors["porepressure"])
-                axes[-1].set_xticks([0, 0.25, 0.5, 0.75, 1.0])
-                axes[-1].legend()
-
-        # maak een plot met helling, aan de rechterkant
-        inclinations = [
-            "inclinationEW",
-            "inclinationNS",
-            "inclinationX",
-            "inclinationY",
-            "inclinationResultant",
+    def plot(self, path="./output", template=False, decimate=False):
+        # de figuur heeft een eigen canvas, er is geen globale pyplot toestand
+        # zodat meerdere figuren tegelijk in threads of processen gemaakt kunnen worden
+        fig = self.figure(template, decimate)
+        fname = f"{path}/{self.filename or self.testid}.png"
+        fig.savefig(fname=fname)
+        return fname
+
+    def plot_layout(self):
+        # de kolommen met waterspanning en helling bepalen de indeling van de figuur
+        present = [
+            column
+            for column in CPT_PLOT_POREPRESSURES + CPT_PLOT_INCLINATIONS
+            if column in self.data.columns and not self.data[column].isnull().all()
         ]
-        inclination_plots = 0
-        for inclination in inclinations:
-            if (
-                inclination in self.data.columns
-                and not self.data[inclination].isnull().all()
-            ):
-                if inclination_plots == 0:
-                    axes.append(ax.twiny())
-                    axes[-1].invert_xaxis()
-                    axes[-1].set_xlim([40, 0])
-                    axes[-1].spines["top"].set_position(("axes", 1.02))
-                    axes[-1].spines["top"].set_bounds(10, 0)
-                    axes[-1].set_xlabel("helling [deg]", loc="right")
-                    axes[-1].xaxis.label.set_color(colors["inclination"])
-                    axes[-1].set_xticks([0, 2, 4, 6, 8, 10])
-                axes[-1].plot(
-                    self.data[inclination],
-                    y,
-                    label=re.sub(r"inclination", "", inclination),
-                    linewidth=1.25,
-                    color=colors["inclination"],
-                )
-                inclination_plots += 1
-        if inclination_plots > 0:
-            axes[-1].legend()
-
-        # plot data
-        axes[0].plot(
-            self.data["coneResistance"],
-            y,
-            label="qc [MPa]",
-            linewidth=1.25,
-            color=colors["qc"],
-        )
-        axes[1].plot(
-            self.data["localFriction"],
-            y,
-            label="fs [MPa]",
-            linewidth=1.25,
-            color=colors["fs"],
-            linestyle="--",
-        )
-        axes[2].plot(
-            self.data["frictionRatio"],
-            y,
-            label="Rf [%]",
-            linewidth=1.25,
-            color=colors["Rf"],
-        )
-
-        # plot maaiveld, bestaat uit een streep en een arcering
-        axes[0].plot(x_maaiveld, y_maaiveld, color="black")
-        axes[0].barh(
-            self.groundlevel,
-            width=10,
-            height=-0.4,
-            align="edge",
-            hatch="/\/",
-            color="#ffffffff",
-        )
-
-        # stel de teksten in voor de labels
-        axes[0].set_ylabel("Niveau [m t.o.v. NAP]")
-        axes[0].set_xlabel("qc [MPa]")
-        axes[1].set_xlabel("fs [MPa]", loc="left")
-        axes[2].set_xlabel("Rf [%]", loc="right")
-
-        # verplaats de x-assen zodat ze niet overlappen
-        axes[1].spines["top"].set_bounds(0, 1)
-        axes[2].spines["top"].set_bounds(15, 0)
-
-        # kleur de labels van de x-assen hetzelfde als de data
-        axes[0].xaxis.label.set_color(colors["qc"])
-        axes[1].xaxis.label.set_color(colors["fs"])
-        axes[2].xaxis.label.set_color(colors["Rf"])
-
-        # stel de min en max waarden van de assen in
-        axes[0].set_xlim([0, 40])  # conusweerstand
-        axes[1].set_xlim([0, 2])  # plaatselijke wrijving
-        axes[2].set_xlim([40, 0])  # wrijvingsgetal
-
-        axes[1].set_xticks([0, 0.5, 1.0])
-        axes[2].set_xticks([0, 2, 4, 6, 8, 10, 12])
-
-        # metadata in plot
-        stempel = fig.add_subplot(gs[1, 0])
-        stempel.set_axis_off()
-        plt.text(
-            0.05,
-            0.6,
-            f"Sondering: {self.testid}\nx-coördinaat: {self.easting}\ny-coördinaat: {self.northing}\nmaaiveld: {self.groundlevel}\n",
-            ha="left",
-            va="top",
-            fontsize=14,
-            fontweight="bold",
-        )
-        plt.text(
-            0.35,
-            0.6,
-            f"Uitvoerder: {self.companyid}\nDatum: {self.date}\nProjectnummer: {self.projectid}\nProjectnaam: {self.projectname}",
-            ha="left",
-            va="top",
-            fontsize=14,
-            fontweight="bold",
-        )
-        plt.text(
-            0.05,
-            0,
-            "Ingenieursbureau Gemeente Amsterdam - Team WGM - Vakgroep Geotechniek",
-            fontsize=13.5,
+        return (
+            tuple(column for column in present if column in CPT_PLOT_POREPRESSURES),
+            tuple(column for column in present if column in CPT_PLOT_INCLINATIONS),
         )
 
-        # maak het grid
-        ax.minorticks_on()
-        ax.tick_params(which="major", color="black")
-        ax.tick_params(which="minor", color="black")
-        ax.grid(which="major", linestyle="-", linewidth="0.15", color="black")
-        ax.grid(which="minor", linestyle="-", linewidth="0.1")
-        ax.grid(b=True, which="both")
-
-        # sla de figuur op
-        plt.tight_layout()
-        plt.savefig(fname=f"./output/{self.filename}.png")
-        plt.close("all")
-
-        # andere optie voor bestandsnaam
-        save_as_projectid_fromfile = False
-        if save_as_projectid_fromfile:
-            if (
-                self.projectid is not None
-            ):  # TODO: dit moet ergens anders. Moet ook projectid uit mapid kunnen halen
-                plt.savefig(fname=f"./output/{self.projectid}_{self.testid}.png")
-                plt.close("all")
-            elif self.projectname is not None:
-                plt.savefig(fname=f"{path}/{self.projectname}_{self.testid}.png")
-                plt.close("all")
+    def figure(self, template=False, decimate=False):
+        # met template=True wordt per thread één figuur per indeling hergebruikt
+        # die figuur blijft van de template, sla hem op voor de volgende sondering
+        # met decimate=True worden dichte sonderingen teruggebracht tot wat zichtbaar is
+        layout = self.plot_layout()
+        if template:
+            return cpt_plot_template(layout).render(self, decimate)
+        fig = CptPlotTemplate(*layout).render(self, decimate)
+        fig.tight_layout()
+        return fig
 
     def check_depth(self):
         # soms is er geen diepte, maar wel sondeerlengte aanwezig
@@ -720,147 +1502,233 @@ class XmlCpt:
                 else:
                     self.data["depth"] = self.data["penetrationLength"].abs()
 
-    def interpret(self):
-        # functie die later gebruikt wordt
-        is_below = lambda p, a, b: np.cross(p - a, b - a) > 0
-
-        # de threeType en NEN regels gelden voor log(qc)
-        self.data["logConeResistance"] = np.log(self.data["coneResistance"])
+    def resample(self, grid, columns=None, method="mean", reference="depth"):
+        # zet de metingen op een vast grid, bijvoorbeeld np.arange(0, 30, 0.1)
+        # reference is depth (diepte t.o.v. maaiveld) of nap (niveau t.o.v. NAP)
+        # standaard worden alle numerieke kolommen behalve de diepte gebruikt
+        if columns is None:
+            columns = [
+                column
+                for column in self.data.select_dtypes("number").columns
+                if column != "depth"
+            ]
+        positions = resample_positions(self, reference)
+        return pd.DataFrame(
+            {
+                column: resample_values(
+                    positions, self.measurement(column), grid, method
+                )[0]
+                for column in columns
+            },
+            index=pd.Index(np.asarray(grid, dtype=float), name=reference),
+        )
 
-        self.data = self.interpret_qc_only()
-        self.data = self.interpret_three_type(is_below)
-        self.data = self.interpret_nen(is_below)
-        self.data = self.interpret_robertson()
-        self.data = self.interpret_custom()
+    def interpret(self):
+        interpret_many([self])
 
     def interpret_custom(self):
-        conditions = [
-            self.data["frictionRatio"].le(1.2),
-            self.data["frictionRatio"].ge(4.8),
-        ]
-        choices = ["zand", "veen"]
-        self.data["customInterpretation"] = np.select(conditions, choices, "klei")
+        self.data["customInterpretation"] = label_codes(
+            custom_codes(self.data["frictionRatio"].to_numpy(dtype=float)),
+            INTERPRETATION_DTYPES["customInterpretation"],
+        )
         return self.data
 
     def interpret_qc_only(self):
-        # DFoundations qc only rule
-        conditionsQcOnly = [
-            self.data["coneResistance"] > 4,
-            self.data["coneResistance"] > 1,
-            self.data["coneResistance"] > 0.1,
-        ]
-        choicesQcOnly = ["zand", "klei", "veen"]
-        self.data["qcOnly"] = np.select(conditionsQcOnly, choicesQcOnly, None)
+        self.data["qcOnly"] = label_codes(
+            QC_ONLY.classify(self.data["coneResistance"]),
+            INTERPRETATION_DTYPES["qcOnly"],
+        )
         return self.data
 
-    def interpret_three_type(self, is_below):
-        # DFoundations 3 type rule [frictionRatio, coneResistance] waarden voor lijn die bovengrens vormt
-        # TODO: resultaat komt niet overeen met DFoundations
-        soils3Type = OrderedDict(
-            [
-                [
-                    "veen",
-                    [
-                        np.full((len(self.data), 2), [0.0, np.log10(0.00002)]),
-                        np.full((len(self.data), 2), [10, np.log10(0.2)]),
-                    ],
-                ],
-                [
-                    "klei",
-                    [
-                        np.full((len(self.data), 2), [0.0, np.log10(0.01)]),
-                        np.full((len(self.data), 2), [10, np.log10(100)]),
-                    ],
-                ],
-                [
-                    "zand",
-                    [
-                        np.full((len(self.data), 2), [0.0, np.log10(0.5)]),
-                        np.full((len(self.data), 2), [10, np.log10(5000)]),
-                    ],
-                ],
-            ]
+    def interpret_three_type(self):
+        self.data["threeType"] = label_codes(
+            THREE_TYPE_LINES.classify(
+                self.data["frictionRatio"], self.data["logConeResistance"]
+            ),
+            INTERPRETATION_DTYPES["threeType"],
         )
-        # conditions: check of punt onder de bovengrens ligt
-        conditions3Type = [
-            is_below(
-                self.data[["frictionRatio", "logConeResistance"]], value[0], value[1]
-            )
-            for value in soils3Type.values()
-        ]
-        choices3Type = soils3Type.keys()
-        # toewijzen materialen op basis van de conditions
-        self.data["threeType"] = np.select(conditions3Type, choices3Type, None)
         return self.data
 
-    def interpret_nen(self, is_below):
-        # DFoundations NEN rule [frictionRatio, coneResistance]
-        # TODO: resultaat komt niet overeen met DFoundations
-        soilsNEN = OrderedDict(
-            [
-                # ['veen', [[0, np.log10(0)], [10, np.log10(0.08)]]], # slappe consistentie, past niet in schema
-                [
-                    "veen",
-                    [[0, np.log10(0.000058)], [10, np.log10(0.58)]],
-                ],  # coneResistance van het eerste punt aangepast
-                # ['humeuzeKlei', [[0, np.log10(0.004)], [10, np.log10(39.59)]]], # slappe consistentie, past niet in schema
-                ["humeuzeKlei", [[0, np.log10(0.02)], [10, np.log10(201)]]],
-                ["klei", [[0, np.log10(0.068)], [10, np.log10(676.1)]]],
-                ["zwakZandigeKlei", [[0, np.log10(0.292)], [10, np.log10(2921)]]],
-                ["sterkZandigeKlei", [[0, np.log10(0.516)], [10, np.log10(5165)]]],
-                ["zwakZandigSilt", [[0, np.log10(1.124)], [10, np.log10(11240)]]],
-                ["sterkZandigSilt", [[0, np.log10(2.498)], [10, np.log10(24980)]]],
-                ["sterkSiltigZand", [[0, np.log10(4.606)], [10, np.log10(46060)]]],
-                ["zwakSiltigZand", [[0, np.log10(8.594)], [10, np.log10(85940)]]],
-                ["zand", [[0, np.log10(13.11)], [10, np.log10(131100)]]],
-                ["grind", [[0, np.log10(24.92)], [10, np.log10(249200)]]],
-            ]
+    def interpret_nen(self):
+        self.data["NEN"] = label_codes(
+            NEN_LINES.classify(
+                self.data["frictionRatio"], self.data["logConeResistance"]
+            ),
+            INTERPRETATION_DTYPES["NEN"],
         )
-
-        conditionsNEN = [
-            is_below(
-                self.data[["frictionRatio", "logConeResistance"]],
-                np.full((len(self.data), 2), value[0]),
-                np.full((len(self.data), 2), value[1]),
-            )
-            for value in soilsNEN.values()
-        ]
-        choicesNEN = soilsNEN.keys()
-        self.data["NEN"] = np.select(conditionsNEN, choicesNEN, None)
         return self.data
 
     def interpret_robertson(self):
-        # formula from: Soil Behaviour Type from the CPT: an update
-        # http://www.cpt-robertson.com/PublicationsPDF/2-56%20RobSBT.pdf
-
-        # non-normalized soil behaviour types omgezet naar Nederlandse namen
-        sbtDict = {
-            "veen": 3.6,
-            "klei": 2.95,
-            "zwakKleiigSilt": 2.6,
-            "zwakSiltigZand": 2.05,
-            "sterkSiltigZand": 1.31,
-            "zand": 0,
-        }
-
-        # formule voor non-normalized soil behaviour type
-        sbt = (
-            lambda qc, rf, isbt: (
-                (3.47 - np.log10(qc * 1000 / 100)) ** 2 + (np.log10(rf + 1.22)) ** 2
-            )
-            ** 0.5
-            - isbt
-            > 0
+        self.data["Robertson"] = label_codes(
+            ROBERTSON.classify(
+                robertson_index(self.data["coneResistance"], self.data["frictionRatio"])
+            ),
+            INTERPRETATION_DTYPES["Robertson"],
         )
+        return self.data
 
-        conditions = [
-            sbt(self.data["coneResistance"], self.data["frictionRatio"], value)
-            for value in sbtDict.values()
-        ]
-        choices = sbtDict.keys()
-        self.data["Robertson"] = np.select(conditions, choices, None)
 
-        return self.data
+# componenten van een grondsoort, in de volgorde van de kolommen in de componentenmatrix
+SOIL_COMPONENT_COLUMNS = [
+    "gravel_component",
+    "sand_component",
+    "clay_component",
+    "loam_component",
+    "peat_component",
+    "silt_component",
+    "special_material",
+]
+# verdeling componenten per grondsoort uit BRO XML, in de volgorde van SOIL_COMPONENT_COLUMNS
+# van https://github.com/cemsbv/pygef/blob/master/pygef/broxml.py
+SOIL_NAME_COMPONENTS = {
+    "betonOngebroken": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0],  # specialMaterial
+    "grind": [1.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+    "humeuzeKlei": [0.0, 0.0, 0.9, 0.0, 0.1, 0.0],
+    "keitjes": [1.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+    "klei": [0.0, 0.0, 1.0, 0.0, 0.0, 0.0],
+    "kleiigVeen": [0.0, 0.0, 0.3, 0.0, 0.7, 0.0],
+    "kleiigZand": [0.0, 0.7, 0.3, 0.0, 0.0, 0.0],
+    "kleiigZandMetGrind": [0.05, 0.65, 0.3, 0.0, 0.0, 0.0],
+    "NBE": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0],  # specialMaterial
+    "puin": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0],  # specialMaterial
+    "silt": [0.0, 0.0, 0.0, 0.0, 0.0, 1.0],
+    "siltigZand": [0.0, 0.7, 0.0, 0.0, 0.0, 0.3],
+    "siltigZandMetGrind": [0.05, 0.65, 0.0, 0.0, 0.0, 0.3],
+    "sterkGrindigZand": [0.3, 0.7, 0.0, 0.0, 0.0, 0.0],
+    "sterkGrindigeKlei": [0.3, 0.0, 0.7, 0.0, 0.0, 0.0],
+    "sterkSiltigZand": [0.0, 0.7, 0.0, 0.0, 0.0, 0.3],
+    "sterkZandigGrind": [0.7, 0.3, 0.0, 0.0, 0.0, 0.0],
+    "sterkZandigSilt": [0.0, 0.3, 0.0, 0.0, 0.0, 0.7],
+    "sterkZandigeKlei": [0.0, 0.3, 0.7, 0.0, 0.0, 0.0],
+    "sterkZandigeKleiMetGrind": [0.05, 0.3, 0.65, 0.0, 0.0, 0.0],
+    "sterkZandigVeen": [0.0, 0.3, 0.0, 0.0, 0.7, 0.0],
+    "veen": [0.0, 0.0, 0.0, 0.0, 1.0, 0.0],
+    "zand": [0.0, 1.0, 0.0, 0.0, 0.0, 0.0],
+    "zwakGrindigZand": [0.1, 0.9, 0.0, 0.0, 0.0, 0.0],
+    "zwakGrindigeKlei": [0.1, 0.0, 0.9, 0.0, 0.0, 0.0],
+    "zwakSiltigZand": [0.0, 0.9, 0.0, 0.0, 0.0, 0.1],
+    "zwakSiltigeKlei": [0.0, 0.0, 0.9, 0.0, 0.0, 0.1],
+    "zwakZandigGrind": [0.9, 0.1, 0.0, 0.0, 0.0, 0.0],
+    "zwakZandigSilt": [0.0, 0.9, 0.0, 0.0, 0.0, 0.1],
+    "zwakZandigVeen": [0.0, 0.1, 0.0, 0.0, 0.9, 0.0],
+    "zwakZandigeKlei": [0.0, 0.1, 0.9, 0.0, 0.0, 0.0],
+    "zwakZandigeKleiMetGrind": [0.05, 0.1, 0.85, 0.0, 0.0, 0.0],
+}
+SOIL_NAMES = pd.CategoricalDtype(list(SOIL_NAME_COMPONENTS))
+# matrix met een regel per naam in SOIL_NAMES, de laatste regel (code -1) is voor onbekende namen
+SOIL_COMPONENTS = np.array(
+    [
+        components + [0.0] * (len(SOIL_COMPONENT_COLUMNS) - len(components))
+        for components in SOIL_NAME_COMPONENTS.values()
+    ]
+    + [[np.nan] * len(SOIL_COMPONENT_COLUMNS)]
+)
+SOIL_COMPONENTS.flags.writeable = False
+# paren (fractie, component) per naam, gesorteerd op bijdrage, voor de plot
+# een laag heeft alleen soilCode, de paren worden pas bij het plotten opgezocht
+SOIL_COMPONENT_PAIRS = [
+    tuple(sorted({v: i for i, v in enumerate(components)}.items(), reverse=True))
+    for components in SOIL_NAME_COMPONENTS.values()
+]
+
+
+def soil_layer_components(soillayers):
+    # paren (fractie, component) per laag, None als de grondsoort onbekend is
+    # lagen uit een GEF hebben een kolom components met de NEN 5104 verdeling,
+    # lagen uit een BRO XML alleen soilCode
+    if "components" in soillayers.columns:
+        return [
+            tuple(components.items()) if isinstance(components, dict) else None
+            for components in soillayers["components"]
+        ]
+    if "soilCode" in soillayers.columns:
+        return [
+            SOIL_COMPONENT_PAIRS[int(code)] if code >= 0 else None
+            for code in soillayers["soilCode"]
+        ]
+    return [None] * len(soillayers)
+
+
+# codering van grondsoorten volgens NEN 5104, bijvoorbeeld Kz1h2
+NEN5104_PATTERN = r"(?P<main>[GKLSVZ])(?P<second>[ghklsvz])?(?P<secondQuantity>\d)?(?P<third>[ghklsvz])?(?P<thirdQuantity>\d)?(?P<fourth>[ghklsvz])?(?P<fourthQuantity>\d)?"
+NEN5104_COMPONENTS = {
+    "G": 0,
+    "Z": 1,
+    "K": 2,
+    "S": 5,
+    "V": 4,
+    "L": 3,
+    "H": 4,
+    "N": 6,
+}
+# fractie per cijfer en zonder cijfer van de bijmengingen, zonder cijfer ook als de letter ontbreekt
+# de factoren verschillen zodat twee bijmengingen niet dezelfde fractie krijgen,
+# de fractie is de sleutel in de dictionary met componenten
+NEN5104_ADMIXTURES = {
+    "second": (0.05, 0.05),
+    "third": (0.049, 0.0),
+    "fourth": (0.048, 0.0),
+}
+# aantal verschillende codes dat onthouden wordt
+NEN5104_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=NEN5104_CACHE_SIZE)
+def parse_soil_code(code):
+    # lees één NEN 5104 code, het resultaat wordt gedeeld en is daarom onveranderlijk:
+    # fracties per component (SOIL_COMPONENT_COLUMNS), paren (fractie, component) voor de plot,
+    # de component van de laatste bijmenging en of de code geen grondsoort is (bijvoorbeeld NBE)
+    match = re.search(NEN5104_PATTERN, code)
+    # niet benoemd of geen grondsoort
+    special = "NBE" in code or "0" in code
+    fractions = np.zeros(len(SOIL_COMPONENT_COLUMNS))
+    if match is None:
+        if not special:
+            raise ValueError(f"onbekende grondsoort: {code}")
+        fractions[NEN5104_COMPONENTS["N"]] = 1.0
+        return tuple(fractions), ((1.0, NEN5104_COMPONENTS["N"]),), None, True
+
+    admixtures = []
+    for name, (per_digit, without_digit) in NEN5104_ADMIXTURES.items():
+        digit = match.group(f"{name}Quantity")
+        fraction = without_digit if digit is None else int(digit) * per_digit
+        admixtures.append((match.group(name), fraction))
+    main_fraction = 1 - sum(fraction for _, fraction in admixtures)
+    main = NEN5104_COMPONENTS["N" if special else match.group("main")]
+
+    components = {main_fraction: main}
+    fractions[main] += main_fraction
+    last = None
+    for letter, fraction in admixtures:
+        if letter is not None:
+            last = NEN5104_COMPONENTS[letter.upper()]
+            components[fraction] = last
+            fractions[last] += fraction
+    return tuple(fractions), tuple(components.items()), last, False
+
+
+def parse_soil_codes(codes):
+    # zet NEN 5104 codes om in een matrix met de fractie per component (kolommen
+    # SOIL_COMPONENT_COLUMNS) en per laag een eigen dictionary {fractie: component} voor de plot
+    # elke verschillende code wordt maar één keer gelezen, met de regex in parse_soil_code
+    # een boring heeft weinig verschillende codes, dus het lezen per code kost weinig
+    inverse, unique = pd.factorize(np.asarray(codes, dtype=object))
+    parsed = [parse_soil_code(code) for code in unique]
+    matrix = np.array([fractions for fractions, _, _, _ in parsed]).reshape(
+        -1, len(SOIL_COMPONENT_COLUMNS)
+    )
+    components = []
+    last = None
+    for i in inverse:
+        _, pairs, admixture, unnamed = parsed[i]
+        layer = dict(pairs)
+        if not unnamed:
+            last = admixture
+        elif last is not None:
+            # een laag zonder grondsoort krijgt de laatste bijmenging van de laag erboven met fractie 0
+            layer[0.0] = last
+        components.append(layer)
+    return matrix[inverse], components
 
 
 @dataclass
@@ -878,81 +1746,32 @@ class XmlBorehole:
         self.testid = None
         self.date = None
         self.finaldepth = None
-        self.soillayers = {}
+        self._soillayers = {}
+        # functie die de lagen inleest als die voor het eerst nodig zijn
+        self._loader = None
         self.analyses = []
         self.metadata = {}
         self.descriptionquality = None
 
-    def load_xml(self, xmlFile):
+    @property
+    def soillayers(self):
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            loader(self)
+        return self._soillayers
+
+    @soillayers.setter
+    def soillayers(self, soillayers):
+        self._loader = None
+        self._soillayers = soillayers
+
+    def load_xml(self, xmlFile, lazy=False):
         # lees een boring in vanuit een BRO XML
-        tree = ElementTree()
-        tree.parse(xmlFile)
-        root = tree.getroot()
-
-        for element in root.iter():
-
-            if (
-                "broId" in element.tag or "requestReference" in element.tag
-            ):  # TODO: er zijn ook boringen zonder broId, met requestReference dat toevoegen levert een vreemde waarde voor testid
-                self.testid = element.text
-
-            if "deliveredLocation" in element.tag:
-                location = {
-                    re.sub(r"{.*}", "", p.tag): re.sub(r"\n\s*", "", p.text)
-                    for p in element.iter()
-                    if p.text is not None
-                }
-                self.easting = float(location["pos"].split()[0])
-                self.northing = float(location["pos"].split()[1])
-
-            elif "deliveredVerticalPosition" in element.tag:
-                verticalPosition = {
-                    re.sub(r"{.*}", "", p.tag): re.sub(r"\n\s*", "", p.text)
-                    for p in element.iter()
-                    if p.text is not None
-                }
-                self.groundlevel = float(verticalPosition["offset"])
-
-            elif "finalDepthBoring" in element.tag:
-                self.finaldepth = float(element.text)
-
-            elif "descriptionReportDate" in element.tag:
-                date = {
-                    re.sub(r"{.*}", "", p.tag): re.sub(r"\n\s*", "", p.text)
-                    for p in element.iter()
-                    if p.text is not None
-                }
-                self.date = datetime.strptime(date["date"], "%Y-%m-%d")
-
-            elif "descriptiveBoreholeLog" in element.tag:
-                for child in element.iter():
-                    if "descriptionQuality" in child.tag:
-                        descriptionquality = child.text
-                    elif "descriptionLocation" in child.tag:
-                        descriptionLocation = child.text
-                        soillayers = []
-                    elif "layer" in child.tag:
-                        # TODO: onderscheid maken tussen veld en labbeschrijving
-                        soillayers.append(
-                            {
-                                re.sub(r"{.*}", "", p.tag): re.sub(r"\s*", "", p.text)
-                                for p in child.iter()
-                                if p.text is not None
-                            }
-                        )
-                # zet soillayers om in dataframe om het makkelijker te verwerken
-                self.soillayers[descriptionLocation] = pd.DataFrame(soillayers)
-
-            elif "boreholeSampleAnalysis" in element.tag:
-                for child in element.iter():
-                    if "investigatedInterval" in child.tag:
-                        self.analyses.append(
-                            {
-                                re.sub(r"{.*}", "", p.tag): re.sub(r"\s*", "", p.text)
-                                for p in child.iter()
-                                if p.text is not None
-                            }
-                        )
+        # met lazy wordt alleen de metadata gelezen, de lagen pas bij het eerste gebruik van soillayers
+        if lazy:
+            BHR_XML.parse(self, xmlFile, stop=BHR_XML_DATA.handlers)
+        else:
+            BHR_XML.parse(self, xmlFile)
 
         self.metadata = {
             "easting": self.easting,
@@ -963,10 +1782,22 @@ class XmlBorehole:
             "finaldepth": self.finaldepth,
         }
 
+        if lazy:
+            self._loader = partial(XmlBorehole.load_xml_data, xmlFile=xmlFile)
+        else:
+            self.prepare_soillayers()
+
+    def load_xml_data(self, xmlFile):
+        # lees alleen de lagen en analyses uit een BRO XML
+        BHR_XML_DATA.parse(self, xmlFile)
+        self.prepare_soillayers()
+
+    def prepare_soillayers(self):
         for descriptionLocation, soillayers in self.soillayers.items():
             # TODO: mogelijk verwarrend om soillayers en self.soillayers te combineren
             # voeg de componenten toe t.b.v. plot
-            self.soillayers[descriptionLocation] = self.add_components(soillayers)
+            soillayers = self.add_components(soillayers)
+            self.soillayers[descriptionLocation] = soillayers
 
             # specialMaterial was voor het maken van de componenten op NBE gezet, nu weer terug naar de oorspronkelijke waarde
             if "specialMaterial" in soillayers.columns:
@@ -989,7 +1820,7 @@ class XmlBorehole:
                 self.groundlevel - soillayers["lowerBoundary"]
             )
 
-    def to_gef_string(self) -> str:
+    def gef_header(self) -> str:
         s = "#GEFID= 1, 1, 0\n"
         s += "#FILEOWNER= LeveeLogic\n"
         s += (
@@ -1013,195 +1844,84 @@ class XmlBorehole:
         s += "#LANGUAGE= NL\n"
         s += "#EOH=\n"
 
-        for _, row in self.soillayers["veld"].iterrows():
-            top = self.groundlevel - row["upper_NAP"]
-            bot = self.groundlevel - row["lower_NAP"]
-            soilname = row["soilName"]
-            try:
-                sand = row["sandMedianClass"]
-            except:
-                sand = ''
-            
-            try:
-                organic = row["organicMatterContentClass"]
-            except:
-                organic = ''
+        return s
 
-            if type(sand)!=str and np.isnan(sand):
-                sand = ""
-            
-            if type(organic)!=str and np.isnan(organic):
-                organic = ""
+    def write_gef(self, f):
+        # schrijf de GEF direct naar een open bestand of buffer
+        f.write(self.gef_header())
 
-            s += f"{top:.2f};{bot:.2f};{soilname};{sand};;{organic};;\n"
+        layers = self.soillayers["veld"]
+        top = self.groundlevel - layers["upper_NAP"].to_numpy(dtype=float)
+        bot = self.groundlevel - layers["lower_NAP"].to_numpy(dtype=float)
+        soilname = layers["soilName"].to_numpy()
+        # optionele kolommen worden één keer per boring opgezocht, niet per laag
+        sand = optional_text_column(layers, "sandMedianClass")
+        organic = optional_text_column(layers, "organicMatterContentClass")
 
-        return s
+        write_records(f, "%.2f;%.2f;%s;%s;;%s;;\n", [top, bot, soilname, sand, organic])
 
-    def to_gef(self, output_file: str):
-        gef_string = self.to_gef_string()
-        f = open(output_file, "w")
-        f.write(gef_string)
-        f.close()
+    def to_gef_string(self) -> str:
+        s = StringIO()
+        self.write_gef(s)
+        return s.getvalue()
 
-    def load_gef(self, gefFile):
+    def to_gef(self, output_file: str):
+        with open(output_file, "w") as f:
+            self.write_gef(f)
 
+    def load_gef(self, gefFile, encoding=None, lazy=False):
+        # met lazy wordt alleen de header gelezen, de lagen pas bij het eerste gebruik van soillayers
         self.columninfo = {}
         self.columnvoid_values = {}
+        self.columnseparator = " "
+        self.recordseparator = ""
         self.descriptionquality = str()  # TODO
 
         GEF_COLINFO = {"1": "upper", "2": "lower"}
 
-        test_id_pattern = re.compile(r"#TESTID\s*=\s*(?P<testid>.*)\s*")
-        xy_id_pattern = re.compile(
-            r"#XYID\s*=\s*(?P<refsystem>\d*),\s*(?P<X>\d*\.?\d*),\s*(?P<Y>\d*\.?\d*)(,\s*(?P<dX>\d*\.?\d*),\s*(?P<dY>\d*\.?\d*))?\s*"
-        )
-        xydxdy_id_pattern = re.compile(
-            r"#XYID\s*=\s*(?P<coordsys>\d*)\s*,\s*(?P<X>\d*.?\d*)\s*,\s*(?P<Y>\d*.?\d*)\s*,\s*(?P<dx>\d*.?\d*),\s*(?P<dy>\d*.?\d*)\s*"
-        )
-        z_id_pattern = re.compile(
-            r"#ZID\s*=\s*(?P<refsystem>\d*),\s*(?P<Z>\d*\.?\d*)(,\s*(?P<dZ>\d*\.?\d*))"
-        )
-        zdz_id_pattern = re.compile(
-            r"#ZID\s*=\s*(?P<datum>\d*)\s*,\s*(?P<Z>.*)\s*,\s*(?P<dZ>.*)\s*"
-        )
-
-        companyid_pattern = re.compile(
-            r"#COMPANYID\s*=\s*(?P<companyid>.*),\s*\w*,\s*\d*\s*"
-        )
-        projectid_pattern = re.compile(r"#PROJECTID\s*=\s*(?P<projectid>\d*)\s*")
-        projectname_pattern = re.compile(r"#PROJECTNAME\s*=\s*(?P<projectname>.*)\s*")
-        companyid_in_measurementext_pattern = re.compile(
-            r"#MEASUREMENTTEXT\s*=\s*\d*,\s*(?P<companyid>.*),\s*boorbedrijf\s*"
-        )
-        projectname_in_measurementtext_pattern = re.compile(
-            r"#MEASUREMENTTEXT\s*=\s*\d*,\s*(?P<projectname>.*),\s*projectnaam\s*"
-        )
-        filedate_pattern = re.compile(
-            r"#FILEDATE\s*=\s*(?P<filedate>\d*,\s*\d*,\s*\d*)\s*"
-        )
-
-        data_pattern = re.compile(r"#EOH\s*=\s*(?P<data>(.*\n)*)")
-
-        columnvoid_pattern = re.compile(
-            r"#COLUMNVOID\s*=\s*(?P<columnnr>\d*),\s*(?P<voidvalue>.*)\s*"
-        )
-        columninfo_pattern = re.compile(
-            r"#COLUMNINFO\s*=\s*(?P<columnnr>\d*),\s*(?P<unit>.*),\s*(?P<parameter>.*),\s*(?P<quantitynr>\d*)\s*"
-        )
-        columnseparator_pattern = re.compile(
-            r"#COLUMNSEPARATOR\s*=\s*(?P<columnseparator>.*)"
-        )
-        recordseparator_pattern = re.compile(
-            r"#RECORDSEPARATOR\s*=\s*(?P<recordseparator>.*)"
-        )
-
-        with open(gefFile) as f:
-            gef_raw = f.read()
-
-        try:
-            match = re.search(test_id_pattern, gef_raw)
-            self.testid = match.group("testid")
-        except:
-            pass
+        # een al geopend GefFile wordt gebruikt en gesloten, de header is dan al gelezen
+        if isinstance(gefFile, GefFile):
+            gef, gefFile = gefFile, gefFile.path
+        else:
+            gef = GefFile(gefFile, encoding)
+        with gef:
+            header = gef.header
+            encoding = gef.encoding
+            set_gef_metadata(self, header)
+            if lazy:
+                # voorlopig de onderkant van de laatste laag, na het inlezen van de lagen
+                # het verschil tussen de bovenste en onderste laag
+                self.finaldepth = gef_finaldepth(gef, self, ["2"])
+            else:
+                self.soillayers["veld"] = gef.data_text()  # TODO: lab toevoegen
 
         try:
-            match = re.search(xy_id_pattern, gef_raw)
-            self.easting = float(match.group("X"))
-            self.northing = float(match.group("Y"))
-        except:
-            pass
-        try:
-            match = re.search(xydxdy_id_pattern, gef_raw)
-            self.easting = float(match.group("X"))
-            self.northing = float(match.group("Y"))
-        except:
+            self.date = date(*[int(x) for x in header.fields("FILEDATE")[:3]])
+        except (TypeError, ValueError):
             pass
 
-        # check oude RD-coördinaten
-        if self.easting < 0:
-            tf = Transformer.from_crs(28991, 28892)
-            x, y = tf.transform(self.easting, self.northing)
-            self.easting = x
-            self.northing = y
+        # informatie in kolommen kan meerdere namen hebben
+        # nummers zijn wel gestandardiseerd
+        for columninfo in header.all("COLUMNINFO"):
+            columninfo = split_fields(columninfo)
+            if columninfo[-1] in GEF_COLINFO:
+                # kolomnummers in pandas starten op 0, in gef op 1
+                self.columninfo[int(columninfo[0]) - 1] = GEF_COLINFO[columninfo[-1]]
 
-        try:
-            match = re.search(z_id_pattern, gef_raw)
-            self.groundlevel = float(match.group("Z"))
-        except:
-            pass
-        try:
-            match = re.search(zdz_id_pattern, gef_raw)
-            self.groundlevel = float(match.group("Z"))
-        except:
-            pass
-        try:
-            match = re.search(data_pattern, gef_raw)
-            self.soillayers["veld"] = match.group("data")  # TODO: lab toevoegen
-        except:
-            pass
+        if lazy:
+            self._loader = partial(
+                XmlBorehole.load_gef_data, gefFile=gefFile, encoding=encoding
+            )
+        else:
+            self.read_gef_layers()
 
-        try:
-            match = re.search(companyid_pattern, gef_raw)
-            self.companyid = match.group("companyid")
-        except:
-            pass
-        try:
-            match = re.search(projectid_pattern, gef_raw)
-            self.projectid = match.group("projectid")
-        except:
-            pass
-        try:
-            match = re.search(projectname_pattern, gef_raw)
-            self.projectname = match.group("projectname")
-        except:
-            pass
-        try:
-            match = re.search(companyid_in_measurementext_pattern, gef_raw)
-            self.companyid = match.group("companyid")
-        except:
-            pass
-        try:
-            match = re.search(projectname_in_measurementtext_pattern, gef_raw)
-            self.projectname = match.group("projectname")
-        except:
-            pass
-        try:
-            match = re.search(filedate_pattern, gef_raw)
-            filedatestring = match.group("filedate")
-            filedatelist = [int(x) for x in filedatestring.split(",")]
-            self.date = date(filedatelist[0], filedatelist[1], filedatelist[2])
-        except:
-            pass
-        try:
-            match = re.search(columnseparator_pattern, gef_raw)
-            self.columnseparator = match.group("columnseparator")
-        except:
-            pass
-        try:
-            match = re.search(recordseparator_pattern, gef_raw)
-            self.recordseparator = match.group("recordseparator")
-        except:
-            pass
-        try:
-            matches = re.finditer(columnvoid_pattern, gef_raw)
-            for match in matches:
-                columnnr = match.group("columnnr")
-                voidvalue = match.group("voidvalue")
-                self.columnvoid_values[int(columnnr) - 1] = float(voidvalue)
-        except:
-            pass
-        try:
-            # informatie in kolommen kan meerdere namen hebben
-            # nummers zijn wel gestandardiseerd
-            matches = re.finditer(columninfo_pattern, gef_raw)
-            for match in matches:
-                columnnr = match.group("columnnr")
-                quantitynr = match.group("quantitynr")
-                # kolomnummers in pandas starten op 0, in gef op 1
-                self.columninfo[int(columnnr) - 1] = GEF_COLINFO[quantitynr]
-        except:
-            pass
+    def load_gef_data(self, gefFile, encoding=None):
+        # lees alleen de lagen uit een GEF waarvan de header al gelezen is
+        with GefFile(gefFile, encoding) as gef:
+            self.soillayers["veld"] = gef.data_text()  # TODO: lab toevoegen
+        self.read_gef_layers()
 
+    def read_gef_layers(self):
         # zet de data om in een dataframe, dan kunnen we er wat mee
         self.soillayers["veld"] = pd.read_csv(
             StringIO(self.soillayers["veld"]),
@@ -1243,94 +1963,20 @@ class XmlBorehole:
         )
 
         # zet de codering om in iets dat geplot kan worden
-        material_pattern = re.compile(
-            r"(?P<main>[GKLSVZ])(?P<second>[ghklsvz])?(?P<secondQuantity>\d)?(?P<third>[ghklsvz])?(?P<thirdQuantity>\d)?(?P<fourth>[ghklsvz])?(?P<fourthQuantity>\d)?"
+        # kreeg een keer 0 als material, vandaar de str
+        fractions, components = parse_soil_codes(
+            self.soillayers["veld"]["soilName"].astype(str).to_numpy()
         )
-
-        components = []
-        for row in self.soillayers["veld"].itertuples():
-            componentsRow = {}
-            material = str(
-                getattr(row, "soilName")
-            )  # kreeg een keer 0 als material, vandaar de str
-            if "NBE" in material or "0" in material:
-                main = "N"
-                secondQuantity, thirdQuantity, fourthQuantity = 0, 0, 0
-            else:
-                match = re.search(material_pattern, material)
-                main = match.group("main")
-
-            try:
-                match = re.search(material_pattern, material)
-                second = match.group("second")
-                secondQuantity = 0.05
-            except:
-                pass
-
-            try:
-                match = re.search(material_pattern, material)
-                third = match.group("third")
-                thirdQuantity = 0.0
-            except:
-                pass
-
-            try:
-                match = re.search(material_pattern, material)
-                fourth = match.group("fourth")
-                fourthQuantity = 0.0
-            except:
-                pass
-
-            try:
-                match = re.search(material_pattern, material)
-                secondQuantity = int(match.group("secondQuantity")) * 0.05
-            except:
-                pass
-
-            try:
-                match = re.search(material_pattern, material)
-                thirdQuantity = int(match.group("thirdQuantity")) * 0.049
-            except:
-                pass
-
-            try:
-                match = re.search(material_pattern, material)
-                fourthQuantity = int(match.group("fourthQuantity")) * 0.048
-            except:
-                pass
-
-            mainQuantity = 1 - secondQuantity - thirdQuantity - fourthQuantity
-
-            material_components = {
-                "G": 0,
-                "Z": 1,
-                "K": 2,
-                "S": 5,
-                "V": 4,
-                "L": 3,
-                "H": 4,
-                "N": 6,
-            }
-
-            componentsRow[mainQuantity] = material_components[main]
-            try:
-                componentsRow[secondQuantity] = material_components[second.upper()]
-            except:
-                pass
-            try:
-                componentsRow[thirdQuantity] = material_components[third.upper()]
-            except:
-                pass
-
-            try:
-                componentsRow[fourthQuantity] = material_components[fourth.upper()]
-            except:
-                pass
-
-            components.append(componentsRow)
         self.soillayers["veld"]["components"] = components
+        self.soillayers["veld"][SOIL_COMPONENT_COLUMNS] = fractions
 
     def plot(self, path="./output"):
+        fig = self.figure()
+        fname = f"{path}/{self.testid}.png"
+        fig.savefig(fname=fname)
+        return fname
+
+    def figure(self):
 
         materials = {
             0: "grind",
@@ -1362,7 +2008,8 @@ class XmlBorehole:
 
         nrOfLogs = len(self.soillayers.keys())
         # maak een diagram met primaire en secundaire componenten
-        fig = plt.figure(figsize=(6, self.finaldepth + 2))
+        fig = Figure(figsize=(6, self.finaldepth + 2))
+        FigureCanvasAgg(fig)
         gs = GridSpec(
             nrows=2,
             ncols=2 * nrOfLogs,
@@ -1381,27 +2028,44 @@ class XmlBorehole:
             # maak een eenvoudige plot van een boring
             uppers = list(soillayers["upper_NAP"])
             lowers = list(soillayers["lower_NAP"])
-            components = list(soillayers["components"])
+            components = soil_layer_components(soillayers)
 
+            # verzamel de vlakken per materiaal, elk materiaal wordt één collectie
+            rectangles = {nr: [] for nr in materials}
             for upper, lower, component in reversed(
                 list(zip(uppers, lowers, components))
             ):
+                # geen componenten, bijvoorbeeld een onbekende grondsoort (lab boring van Anthony Moddermanstraat)
+                if component is None:
+                    continue
                 left = 0
-                try:  # TODO: kan dit beter. Gemaakt vanwege een geval met component = nan (lab boring van Anthony Moddermanstraat)
-                    for comp, nr in component.items():
-                        barPlot = axes[i * 2].barh(
-                            lower,
-                            width=comp,
-                            left=left,
-                            height=upper - lower,
-                            color=colorsDict[nr],
-                            hatch=hatchesDict[nr],
-                            edgecolor="black",
-                            align="edge",
-                        )
-                        left += comp
-                except:
-                    pass
+                for comp, nr in component:
+                    rectangles[nr].append(
+                        [
+                            (left, lower),
+                            (left + comp, lower),
+                            (left + comp, upper),
+                            (left, upper),
+                        ]
+                    )
+                    left += comp
+
+            for nr, vertices in rectangles.items():
+                if not vertices:
+                    continue
+                collection = PolyCollection(
+                    vertices,
+                    facecolors=colorsDict[nr],
+                    edgecolors="black",
+                    hatch=hatchesDict[nr],
+                    joinstyle="miter",
+                )
+                # net als bij barh blijft de x-as aan de linkerkant van de vlakken staan
+                collection.sticky_edges.x.extend(
+                    sorted({vertex[0][0] for vertex in vertices})
+                )
+                axes[i * 2].add_collection(collection)
+            axes[i * 2].autoscale_view()
 
             axes[i * 2].set_ylim([self.groundlevel - self.finaldepth, self.groundlevel])
             axes[i * 2].set_xticks([])
@@ -1444,22 +2108,21 @@ class XmlBorehole:
         # verberg de assen van de onderste plot en rechtse plot zodat deze gebruikt kunnen worden voor tekst
         axes[1].set_axis_off()  # toelichting op veldbeschrijving
         axes[-1].set_axis_off()  # stempel
-        plt.text(
+        axes[-1].text(
             0.05,
             0.6,
             f"Boring: {self.testid}\nx-coördinaat: {self.easting}\ny-coördinaat: {self.northing}\nmaaiveld: {self.groundlevel}\nkwaliteit: {self.descriptionquality}\ndatum: {self.date}",
             fontsize=14,
             fontweight="bold",
         )
-        plt.text(
+        axes[-1].text(
             0.05,
             0.2,
             "Ingenieursbureau Gemeente Amsterdam Vakgroep Geotechniek Python ",
             fontsize=10,
         )
-        plt.tight_layout()
-        plt.savefig(fname=f"{path}/{self.testid}.png")
-        plt.close("all")
+        fig.tight_layout()
+        return fig
 
     def from_cpt(self, cpt, interpretationModel="customInterpretation"):
 
@@ -1503,64 +2166,25 @@ class XmlBorehole:
 
     def add_components(self, soillayers):
         # voeg verdeling componenten toe
-        # van https://github.com/cemsbv/pygef/blob/master/pygef/broxml.py
-        material_components = [
-            "gravel_component",
-            "sand_component",
-            "clay_component",
-            "loam_component",
-            "peat_component",
-            "silt_component",
-            "special_material",
-        ]
-        soil_names_dict_lists = {
-            "betonOngebroken": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0],  # specialMaterial
-            "grind": [1.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-            "humeuzeKlei": [0.0, 0.0, 0.9, 0.0, 0.1, 0.0],
-            "keitjes": [1.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-            "klei": [0.0, 0.0, 1.0, 0.0, 0.0, 0.0],
-            "kleiigVeen": [0.0, 0.0, 0.3, 0.0, 0.7, 0.0],
-            "kleiigZand": [0.0, 0.7, 0.3, 0.0, 0.0, 0.0],
-            "kleiigZandMetGrind": [0.05, 0.65, 0.3, 0.0, 0.0, 0.0],
-            "NBE": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0],  # specialMaterial
-            "puin": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0],  # specialMaterial
-            "silt": [0.0, 0.0, 0.0, 0.0, 0.0, 1.0],
-            "siltigZand": [0.0, 0.7, 0.0, 0.0, 0.0, 0.3],
-            "siltigZandMetGrind": [0.05, 0.65, 0.0, 0.0, 0.0, 0.3],
-            "sterkGrindigZand": [0.3, 0.7, 0.0, 0.0, 0.0, 0.0],
-            "sterkGrindigeKlei": [0.3, 0.0, 0.7, 0.0, 0.0, 0.0],
-            "sterkSiltigZand": [0.0, 0.7, 0.0, 0.0, 0.0, 0.3],
-            "sterkZandigGrind": [0.7, 0.3, 0.0, 0.0, 0.0, 0.0],
-            "sterkZandigSilt": [0.0, 0.3, 0.0, 0.0, 0.0, 0.7],
-            "sterkZandigeKlei": [0.0, 0.3, 0.7, 0.0, 0.0, 0.0],
-            "sterkZandigeKleiMetGrind": [0.05, 0.3, 0.65, 0.0, 0.0, 0.0],
-            "sterkZandigVeen": [0.0, 0.3, 0.0, 0.0, 0.7, 0.0],
-            "veen": [0.0, 0.0, 0.0, 0.0, 1.0, 0.0],
-            "zand": [0.0, 1.0, 0.0, 0.0, 0.0, 0.0],
-            "zwakGrindigZand": [0.1, 0.9, 0.0, 0.0, 0.0, 0.0],
-            "zwakGrindigeKlei": [0.1, 0.0, 0.9, 0.0, 0.0, 0.0],
-            "zwakSiltigZand": [0.0, 0.9, 0.0, 0.0, 0.0, 0.1],
-            "zwakSiltigeKlei": [0.0, 0.0, 0.9, 0.0, 0.0, 0.1],
-            "zwakZandigGrind": [0.9, 0.1, 0.0, 0.0, 0.0, 0.0],
-            "zwakZandigSilt": [0.0, 0.9, 0.0, 0.0, 0.0, 0.1],
-            "zwakZandigVeen": [0.0, 0.1, 0.0, 0.0, 0.9, 0.0],
-            "zwakZandigeKlei": [0.0, 0.1, 0.9, 0.0, 0.0, 0.0],
-            "zwakZandigeKleiMetGrind": [0.05, 0.1, 0.85, 0.0, 0.0, 0.0],
-        }
-
-        # voor sorteren op bijdrage is het handiger om een dictionary te maken
-        soil_names_dict_dicts = {}
-        for key, value in soil_names_dict_lists.items():
-            soil_names_dict_dicts[key] = dict(
-                sorted({v: i for i, v in enumerate(value)}.items(), reverse=True)
-            )
-
         # TODO: soilNameNEN5104 specialMaterial
         soillayers["soilName"] = np.where(
             soillayers["geotechnicalSoilName"].isna(),
             "NBE",
             soillayers["geotechnicalSoilName"],
         )
-        # voeg de componenten toe
-        soillayers["components"] = soillayers["soilName"].map(soil_names_dict_dicts)
-        return soillayers
+        # een onbekende naam krijgt code -1, dat is de laatste regel met nan
+        codes = SOIL_NAMES.categories.get_indexer(soillayers["soilName"])
+        soillayers["soilCode"] = codes
+        # voeg de componenten toe als kolommen uit de matrix, zonder objecten per laag
+        # de verdeling voor de plot volgt uit soilCode, zie soil_layer_components
+        return pd.concat(
+            [
+                soillayers,
+                pd.DataFrame(
+                    SOIL_COMPONENTS[codes],
+                    columns=SOIL_COMPONENT_COLUMNS,
+                    index=soillayers.index,
+                ),
+            ],
+            axis=1,
+        )
@@ -0,0 +1,60 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmark import bhr_xml
+
+import gefxmlcatalog
+
+# zoals in een levering: opdrachtkenmerk en KvK-nummer na het broId
+DELIVERY = """
+    <brocom:requestReference>PROJ-042</brocom:requestReference>
+    <brocom:deliveryAccountableParty>
+      <brocom:chamberOfCommerceNumber>12345678</brocom:chamberOfCommerceNumber>
+    </brocom:deliveryAccountableParty>"""
+
+
+class TestXmlHeader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        xml = bhr_xml(5, 7)
+        broid = "<brocom:broId>BHR000000000007</brocom:broId>"
+        (self.root / "broid.XML").write_text(xml.replace(broid, broid + DELIVERY))
+        (self.root / "reference.xml").write_text(xml.replace(broid, DELIVERY))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ids_from_header(self):
+        header = gefxmlcatalog.read_header(self.root / "broid.XML")
+        self.assertEqual(header.type, "borehole")
+        self.assertEqual(header.testid, "BHR000000000007")
+        self.assertEqual(header.projectid, "PROJ-042")
+        self.assertEqual(header.companyid, "12345678")
+
+    def test_request_reference_as_testid(self):
+        header = gefxmlcatalog.read_header(self.root / "reference.xml")
+        self.assertEqual(header.testid, "PROJ-042")
+        self.assertEqual(header.projectid, "PROJ-042")
+
+    def test_refresh_catalog(self):
+        connection = gefxmlcatalog.open_catalog(str(self.root / "catalog.sqlite"))
+        summary = gefxmlcatalog.refresh_catalog(connection, str(self.root))
+        self.assertEqual(summary["added"], 2)
+        self.assertEqual(summary["failed"], 0)
+        rows = connection.execute(
+            "SELECT testid, companyid, projectid FROM tests ORDER BY path"
+        ).fetchall()
+        connection.close()
+        self.assertEqual(
+            rows,
+            [
+                ("BHR000000000007", "12345678", "PROJ-042"),
+                ("PROJ-042", "12345678", "PROJ-042"),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from benchmark import bhr_xml
+
+import xml2gef
+
+
+def convert(source: Path, output: Path):
+    # zelfde aanroep als vanaf de command line, in het huidige proces
+    argv = ["xml2gef.py", "--source", str(source), "--output", str(output)]
+    with mock.patch.object(sys, "argv", argv + ["--workers", "1"]):
+        xml2gef.main()
+
+
+class TestOrphans(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.output = self.root / "out"
+        self.output.mkdir()
+        for name, seed in [("A/a1.xml", 0), ("A/sub/a2.xml", 1), ("B/b1.xml", 2)]:
+            xmlfile = self.root / name
+            xmlfile.parent.mkdir(parents=True, exist_ok=True)
+            xmlfile.write_text(bhr_xml(5, seed))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_other_source_keeps_output(self):
+        convert(self.root / "A", self.output)
+        convert(self.root / "B", self.output)
+        for name in ["a1.gef", "a2.gef", "b1.gef"]:
+            self.assertTrue((self.output / name).exists(), name)
+
+    def test_subdirectory_keeps_output(self):
+        convert(self.root / "A", self.output)
+        convert(self.root / "A" / "sub", self.output)
+        self.assertTrue((self.output / "a1.gef").exists())
+        self.assertTrue((self.output / "a2.gef").exists())
+
+    def test_removed_source_removes_output(self):
+        convert(self.root / "A", self.output)
+        convert(self.root / "B", self.output)
+        (self.root / "A" / "a1.xml").unlink()
+        convert(self.root / "A", self.output)
+        self.assertFalse((self.output / "a1.gef").exists())
+        self.assertTrue((self.output / "a2.gef").exists())
+        self.assertTrue((self.output / "b1.gef").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,11 @@
-from typing import List
+import argparse
+import hashlib
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple, Union
 from pathlib import Path
 from tqdm import tqdm
 
@@ -6,33 +13,295 @@ from gefxmlreader import XmlBorehole
 
 SOURCE_DIR = "./testdata"
 OUTPUT_DIR = "./testdata"
+# aantal bestanden dat in één keer naar een worker gaat
+CHUNKSIZE = 64
+# ophogen als de GEF uitvoer verandert, dan worden alle bestanden opnieuw omgezet
+CONVERTER_VERSION = "1"
+# manifest met de omgezette bestanden, staat in de output map
+MANIFEST_NAME = ".xml2gef-manifest.json"
 
 
-def case_insensitive_glob(filepath: str, fileextension: str) -> List[Path]:
+def case_insensitive_glob(
+    filepath: str, fileextension: Union[str, Tuple[str, ...]]
+) -> List[Path]:
     """Find files in given path with given file extension (case insensitive)
 
     Arguments:
         filepath (str): path to files
-        fileextension (str): file extension to use as a filter (example .gef or .csv)
+        fileextension (str | Tuple[str]): file extension or extensions to use as a filter (example .gef or .csv)
 
     Returns:
         List(str): list of files
     """
+    if isinstance(fileextension, str):
+        fileextension = (fileextension,)
+    extensions = {extension.lower() for extension in fileextension}
     p = Path(filepath)
     result = []
     for filename in p.glob("**/*"):
-        if str(filename.suffix).lower() == fileextension.lower():
+        if str(filename.suffix).lower() in extensions:
             result.append(filename.absolute())
     return result
 
 
-def main():
-    xmlfiles = case_insensitive_glob(SOURCE_DIR, ".xml")
-    for f in tqdm(xmlfiles):
-        fname = f"{Path(f).stem}.gef"
+def find_collisions(xmlfiles: List[Path]) -> Dict[str, str]:
+    """Find xml files that would be converted to the same gef file
+
+    The gef file is named after the xml file, so xml files with the same name in
+    different subdirectories collide. These files are not converted at all, so the
+    result does not depend on which worker finishes last.
+
+    Arguments:
+        xmlfiles (List[Path]): xml files to convert
+
+    Returns:
+        Dict[str, str]: error message per colliding xml file
+    """
+    # hoofdletters tellen niet mee, op Windows is dat hetzelfde bestand
+    by_stem = defaultdict(list)
+    for xmlfile in xmlfiles:
+        by_stem[Path(xmlfile).stem.lower()].append(str(xmlfile))
+    collisions = {}
+    for sources in by_stem.values():
+        if len(sources) > 1:
+            for source in sources:
+                others = ", ".join(other for other in sources if other != source)
+                collisions[source] = f"zelfde GEF bestandsnaam als {others}"
+    return collisions
+
+
+def convert_file(xmlfile: Path, output_dir: str) -> Tuple[str, str, Optional[str]]:
+    """Convert a single BRO XML borehole to GEF, errors are returned, not raised
+
+    Arguments:
+        xmlfile (Path): xml file to convert
+        output_dir (str): directory for the gef file, named after the xml file
+
+    Returns:
+        Tuple(str, str, str): xml file, gef file and the error message or None on success
+    """
+    geffile = Path(output_dir) / f"{Path(xmlfile).stem}.gef"
+    try:
         borehole = XmlBorehole()
-        borehole.load_xml(f)
-        borehole.to_gef(Path(OUTPUT_DIR) / fname)
+        borehole.load_xml(str(xmlfile))
+        borehole.to_gef(geffile)
+    except Exception as e:
+        return str(xmlfile), str(geffile), f"{type(e).__name__}: {e}"
+    return str(xmlfile), str(geffile), None
+
+
+def convert_batch(
+    xmlfiles: List[Path],
+    output_dir: str,
+    workers: Optional[int] = None,
+    chunksize: int = CHUNKSIZE,
+) -> Dict:
+    """Convert BRO XML boreholes to GEF using a pool of worker processes
+
+    Arguments:
+        xmlfiles (List[Path]): xml files to convert
+        output_dir (str): directory for the gef files
+        workers (int): number of worker processes, 1 converts in the current process
+        chunksize (int): number of files that is sent to a worker at once
+
+    Returns:
+        Dict: summary with the number of files, converted files and errors per file
+    """
+    collisions = find_collisions(xmlfiles)
+    xmlfiles = [xmlfile for xmlfile in xmlfiles if str(xmlfile) not in collisions]
+    if workers == 1:
+        results = map(convert_file, xmlfiles, repeat(output_dir))
+        results = list(tqdm(results, total=len(xmlfiles)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                convert_file, xmlfiles, repeat(output_dir), chunksize=chunksize
+            )
+            results = list(tqdm(results, total=len(xmlfiles)))
+
+    failed = {xmlfile: error for xmlfile, _, error in results if error is not None}
+    failed.update(collisions)
+    outputs = {xmlfile: geffile for xmlfile, geffile, error in results if error is None}
+    return {
+        "total": len(results) + len(collisions),
+        "converted": len(outputs),
+        "failed": failed,
+        "outputs": outputs,
+    }
+
+
+def file_hash(filename: str) -> str:
+    """Calculate the sha256 hash of a file without reading it into memory at once
+
+    Arguments:
+        filename (str): file to hash
+
+    Returns:
+        str: hexadecimal hash
+    """
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(manifest_file: Path) -> Dict:
+    """Read the manifest of a previous run, a missing or damaged manifest is empty
+
+    Arguments:
+        manifest_file (Path): json file with the manifest
+
+    Returns:
+        Dict: entry with size, mtime, hash, version and output per xml file
+    """
+    try:
+        with open(manifest_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest: Dict, manifest_file: Path):
+    """Write the manifest, via a temporary file so an interrupted run keeps the old one
+
+    Arguments:
+        manifest (Dict): manifest to write
+        manifest_file (Path): json file with the manifest
+    """
+    tmp_file = Path(f"{manifest_file}.tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_file, manifest_file)
+
+
+def plan_conversion(
+    xmlfiles: List[Path], manifest: Dict, source: str
+) -> Tuple[List[Path], List[str], Dict[str, str]]:
+    """Determine which xml files are new or changed since the manifest was written
+
+    A file is unchanged when size and mtime match. When only the mtime differs the
+    hash is compared, so touched but unchanged files are not converted again. Files
+    that would be converted to the same gef file as another xml file in the source
+    directory are not converted, also when the other file is unchanged.
+
+    Several source directories can be converted to the same output directory. Only
+    sources within the given source directory are orphans when they are not found,
+    the gef files of other source directories are left alone.
+
+    Arguments:
+        xmlfiles (List[Path]): xml files found in the source directory
+        manifest (Dict): manifest of the previous run, mtimes of touched files are updated
+        source (str): directory that was searched for the xml files
+
+    Returns:
+        Tuple(List[Path], List[str], Dict[str, str]): files to convert, sources that
+            no longer exist and the error message per colliding file
+    """
+    collisions = find_collisions(xmlfiles)
+    todo = []
+    for xmlfile in xmlfiles:
+        if str(xmlfile) in collisions:
+            continue
+        entry = manifest.get(str(xmlfile))
+        if (
+            entry is None
+            or entry["version"] != CONVERTER_VERSION
+            or not Path(entry["output"]).exists()
+        ):
+            todo.append(xmlfile)
+            continue
+
+        stat = os.stat(xmlfile)
+        if stat.st_size != entry["size"]:
+            todo.append(xmlfile)
+        elif stat.st_mtime_ns != entry["mtime"]:
+            if file_hash(xmlfile) == entry["hash"]:
+                entry["mtime"] = stat.st_mtime_ns
+            else:
+                todo.append(xmlfile)
+
+    current = {str(xmlfile) for xmlfile in xmlfiles}
+    root = Path(source).absolute()
+    orphans = [
+        xmlfile
+        for xmlfile in manifest
+        if xmlfile not in current and root in Path(xmlfile).parents
+    ]
+    return todo, orphans, collisions
+
+
+def remove_orphans(orphans: List[str], manifest: Dict) -> int:
+    """Remove the gef files of xml files that no longer exist and drop them from the manifest
+
+    Arguments:
+        orphans (List[str]): xml files that are in the manifest but no longer exist
+        manifest (Dict): manifest to update
+
+    Returns:
+        int: number of removed gef files
+    """
+    orphaned = set(orphans)
+    # een gef kan ook bij een ander xml bestand met dezelfde naam horen
+    in_use = {
+        entry["output"] for source, entry in manifest.items() if source not in orphaned
+    }
+    removed = 0
+    for source in orphans:
+        output = manifest.pop(source)["output"]
+        if output not in in_use and Path(output).exists():
+            os.remove(output)
+            removed += 1
+    return removed
+
+
+def update_manifest(manifest: Dict, outputs: Dict[str, str]):
+    """Add the converted files to the manifest
+
+    Arguments:
+        manifest (Dict): manifest to update
+        outputs (Dict[str, str]): gef file per converted xml file
+    """
+    for xmlfile, geffile in outputs.items():
+        stat = os.stat(xmlfile)
+        manifest[xmlfile] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": file_hash(xmlfile),
+            "version": CONVERTER_VERSION,
+            "output": geffile,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zet BRO XML boringen om naar GEF")
+    parser.add_argument("--source", default=SOURCE_DIR)
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument(
+        "--force", action="store_true", help="zet ook ongewijzigde bestanden om"
+    )
+    args = parser.parse_args()
+
+    xmlfiles = case_insensitive_glob(args.source, ".xml")
+
+    # alleen nieuwe en gewijzigde bestanden omzetten
+    manifest_file = Path(args.output) / MANIFEST_NAME
+    manifest = {} if args.force else load_manifest(manifest_file)
+    todo, orphans, collisions = plan_conversion(xmlfiles, manifest, args.source)
+    removed = remove_orphans(orphans, manifest)
+
+    summary = convert_batch(todo, args.output, args.workers, args.chunksize)
+    summary["failed"].update(collisions)
+    update_manifest(manifest, summary["outputs"])
+    save_manifest(manifest, manifest_file)
+
+    print(f"{summary['converted']} van {summary['total']} bestanden omgezet")
+    print(f"{len(xmlfiles) - len(todo) - len(collisions)} bestanden ongewijzigd")
+    print(f"{removed} verweesde GEF bestanden verwijderd")
+    for xmlfile, error in summary["failed"].items():
+        print(f"mislukt: {xmlfile}: {error}")
 
 
 if __name__ == "__main__":